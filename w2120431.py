@@ -2,304 +2,4198 @@
 # Date: 24/12/2024
 # Student ID: w2120431(Westminster)\20232969(IIT)
 # Task D: Histogram Display
-import tkinter as tk
-from tkinter import Canvas
+import argparse
+import base64
 import csv
+import glob
+import gzip
+import hashlib
+import html
+import importlib.util
+import io
+import json
+import lzma
+import mmap
+import os
+import queue
+import random
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import date, datetime
+from itertools import compress, islice, repeat
+from operator import add, and_, floordiv, gt, lshift, mul, not_, or_, rshift
+
+
+#Instrumentation
+class Instrumentation:
+    """
+    Records the wall time, rows processed and memory blocks allocated by each
+    stage of showing a histogram (load, aggregate, scale, draw and
+    mainloop-ready) and writes one JSON object per stage. It is off unless
+    the TRAFFIC_TRACE_STAGES environment variable is set (to 1 for standard
+    error or to a file path) or --trace-stages is given.
+    """
+    ENVIRONMENT_VARIABLE = "TRAFFIC_TRACE_STAGES"
+
+    def __init__(self, target=None):
+        """
+        Args:
+            target (str): None to stay off, "1" or "-" for standard error, or a file path to append to.
+        """
+        self.output = None
+        if target:
+            self.enable(target)
+
+    def enable(self, target="-"):
+        """
+        Starts writing stage records to standard error or to the given file.
+        """
+        self.output = sys.stderr if target in ("1", "-") else open(target, "a")
+
+    @property
+    def enabled(self):
+        return self.output is not None
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """
+        Times the code inside the with block as one stage.
+        The record is yielded so that the stage can fill in the rows it processed.
+
+        Args:
+            name (str): The stage name, e.g. "load".
+            fields: Extra values to include in the record, such as the file path.
+        """
+        if self.output is None:
+            yield {}
+            return
+        record = {"stage": name, "rows": None, **fields}
+        blocks = sys.getallocatedblocks()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - started
+            record["allocated_blocks"] = sys.getallocatedblocks() - blocks
+            self.emit(record)
+
+    def emit(self, record):
+        """
+        Writes one record as a JSON line.
+        """
+        if self.output is not None:
+            self.output.write(json.dumps(record) + "\n")
+            self.output.flush()
+
+
+INSTRUMENTATION = Instrumentation(os.environ.get(Instrumentation.ENVIRONMENT_VARIABLE))
+
+
+def profile_call(function, top=20):
+    """
+    Runs a function under cProfile and tracemalloc and prints the top hotspots
+    by cumulative time and the source lines that allocated the most memory.
+
+    Returns:
+        The function's return value.
+    """
+    import cProfile  # Imported here so that runs without --profile start faster
+    import pstats
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        return profiler.runcall(function)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(top)
+        print("Top memory allocations:", file=sys.stderr)
+        for statistic in snapshot.statistics("lineno")[:top // 2]:
+            print(f"  {statistic}", file=sys.stderr)
+
+
+def parse_time_of_day(text):
+    """
+    Converts a 'timeOfDay' value in HH:MM:SS format into seconds since midnight.
+
+    Args:
+        text (str): The time of day (e.g., "14:30:05").
+
+    Returns:
+        int: The number of seconds since midnight.
+
+    Raises:
+        ValueError: If the value is not a time between 00:00:00 and 23:59:59.
+    """
+    hours, minutes, seconds = map(int, text.split(":"))  # Split the time into its parts
+    if not (0 <= hours < 24 and 0 <= minutes < 60 and 0 <= seconds < 60):
+        raise ValueError(f"Invalid time of day {text!r}.")
+    return hours * 3600 + minutes * 60 + seconds
+
+
+@lru_cache(maxsize=1)
+def time_of_day_lookup():
+    """
+    Returns a dict from every valid 8-byte HH:MM:SS value, read as one native
+    64-bit integer, to its number of seconds since midnight.
+    """
+    texts = b"".join(f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}".encode()
+                     for seconds in range(86400))
+    return dict(zip(memoryview(texts).cast("Q"), range(86400)))
+
+
+def parse_times_of_day(values):
+    """
+    Converts many 'timeOfDay' values in HH:MM:SS format (as bytes) into seconds since midnight.
+    The values are joined and read as one 64-bit integer each, which is looked
+    up in time_of_day_lookup with C-level iterators. If any value is not a
+    valid eight-byte time, each value is parsed on its own instead.
+
+    Args:
+        values (list): The time of day of each row, as bytes.
+
+    Returns:
+        array: The number of seconds since midnight of each row.
+    """
+    joined = b"".join(values)
+    if len(joined) == 8 * len(values):
+        try:
+            return array("I", map(time_of_day_lookup().__getitem__, memoryview(joined).cast("Q")))
+        except KeyError:
+            pass  # At least one value is not a valid time
+    return array("I", map(parse_time_of_day, map(bytes.decode, values)))
+
+
+#Compressed Input
+COMPRESSED_SUFFIXES = (".gz", ".xz", ".zst")  # Archived survey files are traffic_dataDDMMYYYY.csv plus one of these
+
+
+def compression_of(file_path):
+    """
+    Returns the compression suffix of a file name, or None for a plain file.
+    """
+    return next((suffix for suffix in COMPRESSED_SUFFIXES if file_path.endswith(suffix)), None)
+
+
+def survey_name(file_path):
+    """
+    Returns the file name without its .csv and compression suffixes, e.g. traffic_data15062024.
+    """
+    name = os.path.basename(file_path)
+    suffix = compression_of(name)
+    name = name[:-len(suffix)] if suffix else name
+    return name[:-4] if name.endswith(".csv") else name
+
+
+def open_decompressed(file_path, raw=None):
+    """
+    Opens a survey file as a binary stream, decompressing it according to its suffix.
+
+    Args:
+        file_path (str): The path of the file; its suffix selects the decompressor.
+        raw: An already open binary file to read the compressed bytes from, or None to open file_path.
+    """
+    suffix = compression_of(file_path)
+    if suffix == ".gz":
+        return gzip.GzipFile(fileobj=raw) if raw is not None else gzip.open(file_path, "rb")
+    if suffix == ".xz":
+        return lzma.LZMAFile(raw if raw is not None else file_path)
+    if suffix == ".zst":
+        try:
+            import zstandard  # Optional: only needed for .zst archives
+        except ImportError:
+            raise ValueError(f"Reading {file_path} needs the zstandard package.") from None
+        source = raw if raw is not None else open(file_path, "rb")
+        reader = zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True, closefd=raw is None)
+        return io.BufferedReader(reader)  # Adds readline, which the stream reader lacks
+    return raw if raw is not None else open(file_path, "rb")
+
+
+def open_survey(file_path, mode="rb"):
+    """
+    Opens a plain or compressed survey file for reading, in binary ("rb") or text ("r") mode.
+    """
+    if compression_of(file_path) is None:
+        return open(file_path, mode)
+    stream = open_decompressed(file_path)
+    return stream if "b" in mode else io.TextIOWrapper(stream)
+
+
+def read_ahead(stream, block_size, depth=4):
+    """
+    Yields blocks read from a stream by a separate thread, which keeps up to
+    depth blocks ready. Decompressors release the GIL while they work, so the
+    next blocks are decompressed while the current one is parsed.
+    """
+    blocks = queue.Queue(maxsize=depth)
+
+    def produce():
+        try:
+            while True:
+                block = stream.read(block_size)
+                blocks.put(block)
+                if not block:
+                    return
+        except Exception as error:  # Hand any read or decompression error to the consumer
+            blocks.put(error)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        block = blocks.get()
+        if isinstance(block, Exception):
+            raise block
+        if not block:
+            return
+        yield block
+
+
+#Columnar Data
+HYBRID_BYTE_FLAGS = [bytes((value >> bit) & 1 for bit in range(8)) for value in range(256)]  # Bitmap byte -> 8 flags
+class TrafficTable:
+    """
+    Stores the rows of a traffic survey CSV file as compact typed columns.
+    Text columns are dictionary-encoded to small integer codes, 'timeOfDay' is
+    stored as seconds since midnight, speeds as unsigned integers and
+    'elctricHybrid' as a bitmap with one bit per vehicle.
+    """
+    CODED_COLUMNS = ("JunctionName", "Date", "travel_Direction_in", "travel_Direction_out",
+                     "Weather_Conditions", "VehicleType")
+    TYPED_COLUMNS = {"timeOfDay": "I", "VehicleSpeed": "B", "JunctionSpeedLimit": "H"}
+    CHUNK_SIZE = 65536  # Number of CSV rows parsed together before being added to the columns
+    MAPPED_BLOCK_SIZE = 2 * 1024 * 1024  # Number of bytes scanned together by the memory-mapped loader
+
+    def __init__(self):
+        """
+        Initializes an empty table with one typed array per column.
+        """
+        self.row_count = 0  # Number of vehicles stored in the table
+        self.labels = {name: [] for name in self.CODED_COLUMNS}  # Code -> text value for each encoded column
+        self._codes = {name: {} for name in self.CODED_COLUMNS}  # Text value -> code for each encoded column
+        self.columns = {name: array("B") for name in self.CODED_COLUMNS}  # One byte per encoded value
+        for name, typecode in self.TYPED_COLUMNS.items():
+            self.columns[name] = array(typecode)
+        self.electric_hybrid = bytearray()  # Bitmap of the 'elctricHybrid' column
+        self.validator = None  # SurveyValidator checking appended rows, if any
+
+    def __len__(self):
+        return self.row_count
+
+    @classmethod
+    def from_buffers(cls, row_count, labels, columns, electric_hybrid):
+        """
+        Builds a read-only table over existing column buffers, such as memory-mapped cache blocks.
+
+        Args:
+            row_count (int): The number of rows in the buffers.
+            labels (dict): The text values of each encoded column, indexed by code.
+            columns (dict): A buffer (array or memoryview) for each column.
+            electric_hybrid: The bitmap of the 'elctricHybrid' column.
+        """
+        table = cls()
+        table.row_count = row_count
+        table.labels = {name: list(values) for name, values in labels.items()}
+        table._codes = {name: {value: code for code, value in enumerate(values)}
+                        for name, values in table.labels.items()}
+        table.columns = columns
+        table.electric_hybrid = electric_hybrid
+        return table
+
+    @classmethod
+    def from_csv(cls, file):
+        """
+        Builds a table from an open CSV file, parsing the rows in chunks.
+
+        Args:
+            file: A text file object positioned at the header row.
+
+        Returns:
+            TrafficTable: The table holding every row of the file.
+        """
+        table = cls()
+        for header, rows in cls.read_chunks(file):
+            table.append_rows(header, rows)
+        return table
+
+    @classmethod
+    def from_path(cls, file_path, block_size=MAPPED_BLOCK_SIZE, validator=None):
+        """
+        Builds a table from a CSV file by memory-mapping it and scanning the bytes.
+        Each block of complete lines is split into fields with bytes methods,
+        cut into columns with slices, and each column is parsed with C-level
+        iterators straight from the bytes, without building a list or dict of
+        strings per row. Blocks that contain quotes or rows with the wrong
+        number of fields are parsed with the csv module instead.
+
+        Args:
+            file_path (str): The path to the CSV file to be loaded.
+            block_size (int): The approximate number of bytes parsed at a time.
+            validator (SurveyValidator): Checks the rows as they are parsed, leaving out bad ones.
+
+        Returns:
+            TrafficTable: The table holding every row of the file.
+        """
+        if compression_of(file_path) is not None:
+            return cls.from_compressed(file_path, block_size, validator)
+        table = cls()
+        table.validator = validator
+        with open(file_path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return table  # An empty file gives an empty table (and cannot be mapped)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                header_end = buffer.find(b"\n") + 1 or len(buffer)
+                header_line = buffer[:header_end].decode()
+                header = next(csv.reader([header_line]), [])
+                if not header:
+                    return table
+                start = header_end
+                while start < len(buffer):
+                    end = buffer.find(b"\n", min(start + block_size, len(buffer))) + 1 or len(buffer)
+                    table.append_block(header, buffer[start:end])
+                    start = end
+        return table
+
+    @classmethod
+    def from_compressed(cls, file_path, block_size=MAPPED_BLOCK_SIZE, validator=None):
+        """
+        Builds a table from a compressed CSV file (.gz, .xz or .zst) without a temporary file.
+        A separate thread decompresses blocks ahead while this one scans the
+        previous blocks, cut at line ends, with the same parser as from_path.
+        """
+        table = cls()
+        table.validator = validator
+        header = None
+        pending = b""  # Start of a line continued in the next block
+        with open_decompressed(file_path) as stream:
+            for block in read_ahead(stream, block_size):
+                data = pending + block
+                if header is None:
+                    header_end = data.find(b"\n") + 1
+                    if not header_end:
+                        pending = data
+                        continue
+                    header = next(csv.reader([data[:header_end].decode()]), [])
+                    data = data[header_end:]
+                end = data.rfind(b"\n") + 1
+                table.append_block(header, data[:end])
+                pending = data[end:]
+        if header and pending:
+            table.append_block(header, pending)  # The last line had no line end
+        return table
+
+    def append_block(self, header, block):
+        """
+        Appends the rows in a block of CSV bytes holding complete lines.
+        """
+        if b"\r" in block:
+            block = block.replace(b"\r\n", b"\n")
+        block = block.rstrip(b"\n")
+        if not block:
+            return
+        n_columns = len(header)
+        n_rows = block.count(b"\n") + 1
+        fields = block.replace(b"\n", b",").split(b",")
+        if b'"' in block or len(fields) != n_rows * n_columns:
+            # Quoted or irregular rows need the csv module
+            rows = [row for row in csv.reader(block.decode().split("\n")) if row]
+            self.append_rows(header, rows)
+            return
+        values = {name: fields[i::n_columns] for i, name in enumerate(header)}  # One slice per column
+        if self.validator is not None:
+            values, n_rows = self.validator.filter(header, values, n_rows)  # Leave out the bad rows
+            if not n_rows:
+                return
+        self._append_columns(values, n_rows, parse_times_of_day(values.get("timeOfDay", [])), b"True")
+
+    @classmethod
+    def iter_chunks(cls, file, chunk_size=CHUNK_SIZE, validator=None):
+        """
+        Yields a separate table for each chunk of rows of an open CSV file.
+        Only one chunk is held in memory at a time, so files larger than RAM
+        can be processed.
+
+        Args:
+            file: A text file object positioned at the header row.
+            chunk_size (int): The number of rows in each chunk.
+            validator (SurveyValidator): Checks the rows of every chunk, leaving out bad ones.
+        """
+        for header, rows in cls.read_chunks(file, chunk_size):
+            table = cls()
+            table.validator = validator
+            table.append_rows(header, rows)
+            yield table
+
+    @staticmethod
+    def read_chunks(file, chunk_size=CHUNK_SIZE):
+        """
+        Yields the header and a list of up to chunk_size CSV rows at a time.
+        """
+        reader = csv.reader(file)
+        header = next(reader, None)  # The first row names the columns
+        if header is None:
+            return  # An empty file has no chunks
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield header, rows
+
+    def append_rows(self, header, rows):
+        """
+        Appends a chunk of CSV rows to the table, one column at a time.
+
+        Args:
+            header (list): The column names of the CSV file.
+            rows (list): The CSV rows as lists of strings.
+        """
+        if self.validator is not None:
+            rows = self.validator.check_rows(header, rows)  # Leave out the bad rows
+            if not rows:
+                return
+        for row in rows:
+            if len(row) != len(header):
+                raise ValueError(f"Expected {len(header)} fields, found {len(row)}: {','.join(row)!r}")
+        values = dict(zip(header, zip(*rows)))  # Transpose the chunk into one tuple per column
+        self._append_columns(values, len(rows), array("I", map(parse_time_of_day, values.get("timeOfDay", ()))))
+
+    def _append_columns(self, values, n_rows, times, true_value="True"):
+        """
+        Appends a chunk of rows held as one sequence of str or bytes values per column.
+        The chunk is parsed completely before any column is extended, so a value
+        that cannot be parsed raises ValueError and leaves the table unchanged.
+        """
+        missing = [name for name in self.CODED_COLUMNS + tuple(self.TYPED_COLUMNS) + ("elctricHybrid",)
+                   if name not in values]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        try:
+            speeds = array("B", map(int, values["VehicleSpeed"]))
+            limits = array("H", map(int, values["JunctionSpeedLimit"]))
+        except OverflowError as error:
+            raise ValueError(f"Speed out of range: {error}") from None
+        codes = {name: self._codes_of(name, values[name]) for name in self.CODED_COLUMNS}
+        for name, column in codes.items():
+            self.columns[name].extend(column)
+        self.columns["timeOfDay"].extend(times)
+        self.columns["VehicleSpeed"].extend(speeds)
+        self.columns["JunctionSpeedLimit"].extend(limits)
+        self._append_flags(values["elctricHybrid"], true_value)
+        self.row_count += n_rows
+
+    def _codes_of(self, name, values):
+        """
+        Dictionary-encodes a chunk of a text column (str or bytes values) and returns the codes.
+        """
+        lookup = {value: self._code(name, value.decode() if isinstance(value, bytes) else value)
+                  for value in set(values)}  # Code of each distinct value in the chunk
+        return array("B", map(lookup.__getitem__, values))
+
+    def _code(self, name, label):
+        """
+        Returns the code of a text value, giving new values the next free code.
+        """
+        codes = self._codes[name]
+        code = codes.get(label)
+        if code is None:
+            labels = self.labels[name]
+            if len(labels) == 256:
+                raise ValueError(f"Too many distinct values in column {name}.")
+            code = codes[label] = len(labels)
+            labels.append(label)
+        return code
+
+    def _append_flags(self, values, true_value="True"):
+        """
+        Appends a chunk of 'True'/'False' values to the electric hybrid bitmap.
+        """
+        start = self.row_count
+        needed = (start + len(values) + 7) // 8  # Bytes required to hold every bit
+        self.electric_hybrid.extend(bytes(needed - len(self.electric_hybrid)))
+        for index in compress(range(start, start + len(values)), map(true_value.__eq__, values)):
+            self.electric_hybrid[index >> 3] |= 1 << (index & 7)  # Set the bit for this vehicle
+
+    def hybrid_flags(self):
+        """
+        Returns the electric hybrid bitmap expanded to one byte (0 or 1) per vehicle.
+        """
+        return b"".join(map(HYBRID_BYTE_FLAGS.__getitem__, self.electric_hybrid))[:self.row_count]
+
+    def nbytes(self):
+        """
+        Returns the number of bytes used by the column buffers.
+        """
+        total = len(self.electric_hybrid)
+        for column in self.columns.values():
+            total += len(column) * column.itemsize
+        return total
+
+    def junction_names(self):
+        """
+        Returns the junction names found in the table, sorted alphabetically.
+        """
+        return sorted(self.labels["JunctionName"])
+
+
+#Validation
+def is_valid_time(value):
+    """
+    Returns True if a 'timeOfDay' value (str or bytes) is a time of day in H:MM:SS format.
+    """
+    parts = (value.decode(errors="replace") if isinstance(value, bytes) else value).split(":")
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return False
+    hours, minutes, seconds = map(int, parts)
+    return hours < 24 and minutes < 60 and seconds < 60
+
+
+class SurveyValidator:
+    """
+    Checks the rows of a survey file while they are parsed, so that bad rows
+    are caught in the same scan that loads and aggregates the file. Each check
+    is a set lookup over a whole column with C-level iterators; only blocks
+    that contain a bad row are looked at row by row. Bad rows are removed from
+    the block, written to a quarantine CSV with their line number and reasons,
+    and counted for the summary.
+    """
+    DIRECTIONS = ("N", "NE", "E", "SE", "S", "SW", "W", "NW")
+    WEATHER = ("Clear", "Bright", "Overcast", "Light Rain", "Heavy Rain", "Fog", "Snow")
+    VEHICLE_TYPES = ("Car", "Van", "Truck", "Buss", "Bicycle", "Motorcycle", "Scooter", "Taxi")
+    SPEED_RANGE = (0, 200)  # Lowest and highest plausible vehicle speed
+    LIMIT_RANGE = (5, 120)  # Lowest and highest plausible junction speed limit
+
+    def __init__(self, expected_date=None, quarantine_path=None, junctions=None):
+        """
+        Args:
+            expected_date (str): The date every row must have in DD/MM/YYYY format, or None to accept any.
+            quarantine_path (str): The CSV file bad rows are written to, or None to only count them.
+            junctions (list): The junction names accepted, or None to accept any name.
+        """
+        self.expected_date = expected_date
+        self.quarantine_path = quarantine_path
+        self.rows_seen = 0  # Rows checked so far, good and bad
+        self.quarantined = 0  # Rows rejected so far
+        self.reasons = Counter()  # Reason -> number of rows rejected for it
+        speeds = [str(speed) for speed in range(self.SPEED_RANGE[0], self.SPEED_RANGE[1] + 1)]
+        limits = [str(limit) for limit in range(self.LIMIT_RANGE[0], self.LIMIT_RANGE[1] + 1)]
+        self.rules = [  # (column, accepted values as str and bytes, reason)
+            ("travel_Direction_in", self.accepted(self.DIRECTIONS), "unknown direction in"),
+            ("travel_Direction_out", self.accepted(self.DIRECTIONS), "unknown direction out"),
+            ("Weather_Conditions", self.accepted(self.WEATHER), "unknown weather"),
+            ("VehicleType", self.accepted(self.VEHICLE_TYPES), "unknown vehicle type"),
+            ("elctricHybrid", self.accepted(("True", "False")), "electric hybrid is not True or False"),
+            ("VehicleSpeed", self.accepted(speeds), "speed out of range"),
+            ("JunctionSpeedLimit", self.accepted(limits), "speed limit out of range"),
+        ]
+        if expected_date is not None:
+            self.rules.append(("Date", self.accepted((expected_date,)), "date does not match the file"))
+        if junctions is not None:
+            self.rules.append(("JunctionName", self.accepted(junctions), "unknown junction"))
+
+    @classmethod
+    def for_file(cls, file_path, quarantine_dir="quarantine", junctions=None):
+        """
+        Returns a validator expecting the date in the file's name, quarantining to quarantine_dir,
+        or only counting the bad rows if quarantine_dir is None.
+        """
+        match = DATA_FILE_PATTERN.search(os.path.basename(file_path))
+        expected_date = f"{match.group(1)[:2]}/{match.group(1)[2:4]}/{match.group(1)[4:]}" if match else None
+        name = survey_name(file_path)
+        quarantine_path = os.path.join(quarantine_dir, f"{name}.quarantine.csv") if quarantine_dir else None
+        return cls(expected_date, quarantine_path, junctions)
+
+    @staticmethod
+    def accepted(values):
+        return frozenset(values) | frozenset(value.encode() for value in values)
+
+    @staticmethod
+    def text(value):
+        return value.decode(errors="replace") if isinstance(value, bytes) else value
+
+    def check_rows(self, header, rows):
+        """
+        Validates a chunk of CSV rows (lists of strings) and returns the good rows.
+        """
+        return [rows[i] for i in self.good_indices(header, rows)]
+
+    def good_indices(self, header, rows):
+        """
+        Validates a chunk of CSV rows (lists of strings) and returns the indices of the good rows.
+        """
+        if not rows:
+            return []
+        n_columns = len(header)
+        bad = {i: [f"expected {n_columns} fields, found {len(row)}"] for i, row in enumerate(rows)
+               if len(row) != n_columns}
+        padded = [(row + [""] * n_columns)[:n_columns] for row in rows] if bad else rows
+        values = dict(zip(header, map(list, zip(*padded))))
+        bad = self.find_bad(header, values, len(rows), bad)
+        if bad:
+            self.quarantine(header, values, bad, rows)
+        self.rows_seen += len(rows)
+        return [i for i in range(len(rows)) if i not in bad]
+
+    def filter(self, header, values, n_rows):
+        """
+        Validates a block of rows held as one sequence per column, and returns
+        the columns with the bad rows removed and the number of rows left.
+
+        Args:
+            header (list): The column names, in file order.
+            values (dict): The values of each column, as str or bytes.
+            n_rows (int): The number of rows in the block.
+        """
+        bad = self.find_bad(header, values, n_rows)
+        if bad:
+            self.quarantine(header, values, bad)
+            keep = [i not in bad for i in range(n_rows)]
+            values = {name: list(compress(column, keep)) for name, column in values.items()}
+        self.rows_seen += n_rows
+        return values, n_rows - len(bad)
+
+    def find_bad(self, header, values, n_rows, bad=None):
+        """
+        Returns the bad rows of a block held as one sequence per column, by index, with their reasons.
+
+        Args:
+            header (list): The column names, in file order.
+            values (dict): The values of each column, as str or bytes.
+            n_rows (int): The number of rows in the block.
+            bad (dict): Rows already known to be bad, e.g. with the wrong number of fields.
+        """
+        missing = [name for name in TrafficTable.CODED_COLUMNS + tuple(TrafficTable.TYPED_COLUMNS) + ("elctricHybrid",)
+                   if name not in values]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        bad = bad or {}
+        known = set(bad)  # Rows with the wrong number of fields, whose values are not checked
+        for name, accepted, reason in self.rules:
+            column = values[name]
+            if not accepted.issuperset(column):
+                for i in compress(range(n_rows), map(not_, map(accepted.__contains__, column))):
+                    if i not in known:
+                        bad.setdefault(i, []).append(f"{reason}: {self.text(column[i])!r}")
+        times = values["timeOfDay"]
+        joined = b"".join(times) if times and isinstance(times[0], bytes) else b""
+        lookup = time_of_day_lookup()
+        if not (len(joined) == 8 * n_rows and lookup.keys() >= set(memoryview(joined).cast("Q"))):
+            for i in compress(range(n_rows), map(not_, map(is_valid_time, times))):
+                if i not in known:
+                    bad.setdefault(i, []).append(f"invalid time of day: {self.text(times[i])!r}")
+        return bad
+
+    def quarantine(self, header, values, bad, rows=None):
+        """
+        Records the bad rows of a block and appends them to the quarantine file.
+        """
+        for reasons in bad.values():
+            self.reasons.update(reason.split(":")[0] for reason in reasons)
+        if self.quarantine_path is not None:
+            os.makedirs(os.path.dirname(self.quarantine_path) or ".", exist_ok=True)
+            with open(self.quarantine_path, "a" if self.quarantined else "w", newline="") as file:
+                writer = csv.writer(file)
+                if not self.quarantined:
+                    writer.writerow(["line", "reasons"] + list(header))
+                for i in sorted(bad):
+                    row = rows[i] if rows is not None else [self.text(values[name][i]) for name in header]
+                    writer.writerow([self.rows_seen + i + 2, "; ".join(bad[i])] + list(row))  # Line 1 is the header
+        self.quarantined += len(bad)
+
+    def summary(self):
+        """
+        Returns the number of rows checked and rejected, the reasons and the quarantine file.
+        """
+        return {"rows": self.rows_seen, "quarantined": self.quarantined, "reasons": dict(self.reasons.most_common()),
+                "quarantine_file": self.quarantine_path if self.quarantined else None}
+
+
+#Aggregation
+JUNCTION_COLORS = ("#b2f6a1", "#e59b9d", "#9fc5f8", "#f9d976", "#c9a0dc", "#f6b26b", "#76d7c4", "#d5a6bd")
+
+
+def junction_color(index):
+    """
+    Returns the bar colour for the junction drawn at the given position.
+    """
+    return JUNCTION_COLORS[index % len(JUNCTION_COLORS)]
+
+
+class JunctionRegistry:
+    """
+    The junctions known to the program, each with an integer id, a colour and
+    a layout slot (its position among the bars of a bin). Entries come from a
+    JSON config file or are added the first time a junction appears in the
+    data, so any number of junctions is drawn and every junction keeps the
+    same colour and position from day to day.
+    """
+    def __init__(self, junctions=()):
+        """
+        Args:
+            junctions: Entries as dicts with a "name" and optionally a "color" and "slot".
+        """
+        self.ids = {}  # Junction name -> id
+        self.names = []  # Id -> junction name
+        self.colors = []  # Id -> fill colour
+        self.slots = []  # Id -> layout slot
+        for entry in junctions:
+            self.add(entry["name"], entry.get("color"), entry.get("slot"))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Reads a registry from a JSON file holding {"junctions": [{"name": ..., "color": ..., "slot": ...}, ...]}.
+        """
+        with open(path, "r") as file:
+            config = json.load(file)
+        return cls(config["junctions"] if isinstance(config, dict) else config)
+
+    @classmethod
+    def from_data(cls, directory="."):
+        """
+        Builds a registry of every junction in the survey files of a directory, in alphabetical order.
+        """
+        index = TrafficDatasetIndex(directory)
+        index.refresh()
+        return cls({"name": name} for name in index.junctions())
+
+    def entries(self):
+        """
+        Returns the registry as plain dicts, in id order, e.g. to send to worker processes.
+        """
+        return [{"name": name, "color": color, "slot": slot}
+                for name, color, slot in zip(self.names, self.colors, self.slots)]
+
+    def save(self, path):
+        """
+        Writes the registry as a JSON config file that can be edited and loaded again.
+        """
+        with open(path, "w") as file:
+            json.dump({"junctions": self.entries()}, file, indent=2)
+
+    def add(self, name, color=None, slot=None):
+        """
+        Registers a junction, giving it the next id and, unless given, the next colour and slot.
+
+        Returns:
+            int: The id of the junction.
+        """
+        junction_id = self.ids.get(name)
+        if junction_id is None:
+            junction_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.colors.append(color or junction_color(junction_id))
+            self.slots.append(junction_id if slot is None else slot)
+        return junction_id
+
+    def color(self, name):
+        """
+        Returns the colour of a junction, registering it if it is new.
+        """
+        return self.colors[self.add(name)]
+
+    def slot(self, name):
+        """
+        Returns the layout slot of a junction, registering it if it is new.
+        """
+        return self.slots[self.add(name)]
+
+    def slot_count(self):
+        """
+        Returns the number of bar positions in each bin: one past the highest slot.
+        """
+        return max(self.slots, default=-1) + 1
+
+    def order(self, names):
+        """
+        Returns junction names in layout order, registering new ones in alphabetical order.
+        """
+        for name in sorted(names):
+            self.add(name)
+        return sorted(names, key=lambda name: (self.slots[self.ids[name]], self.ids[name]))
+
+
+class TrafficCounts:
+    """
+    Vehicle counts per time bin for each junction, e.g. 24 hourly bins or 96
+    bins of 15 minutes. Each junction has one array of counts indexed by bin.
+    """
+    def __init__(self, bin_seconds=3600):
+        """
+        Initializes empty counts with the given bin width.
+
+        Args:
+            bin_seconds (int): The width of each bin in seconds; must divide a day evenly.
+        """
+        if bin_seconds <= 0 or 86400 % bin_seconds:
+            raise ValueError(f"Bin width of {bin_seconds} seconds does not divide a day evenly.")
+        self.bin_seconds = bin_seconds  # Width of each bin in seconds
+        self.n_bins = 86400 // bin_seconds  # Number of bins in a day
+        self.columns = {}  # Junction name -> array of counts per bin
+
+    @classmethod
+    def from_table(cls, table, bin_seconds=3600):
+        """
+        Counts the vehicles of a traffic table per bin and junction.
+        """
+        counts = cls(bin_seconds)
+        for junction in table.junction_names():
+            counts.column(junction)  # Junctions with no vehicles in a bin still get a bar
+        counts.fold_table(table)
+        return counts
+
+    @property
+    def junctions(self):
+        return sorted(self.columns)
+
+    def column(self, junction):
+        """
+        Returns the array of counts for a junction, adding it if it is new.
+        """
+        counts = self.columns.get(junction)
+        if counts is None:
+            counts = self.columns[junction] = array("L", bytes(self.n_bins * array("L").itemsize))
+        return counts
+
+    def fold_table(self, table, start=0):
+        """
+        Adds the vehicles of a traffic table, from row start on, to the counts.
+        The bin and junction code of each row are combined into one integer key
+        and counted in a single pass of C-level iterators, without any per-row
+        Python code. Counts are kept per junction name; the table's junction
+        codes are resolved to their count arrays once per table, not per row.
+
+        Returns:
+            list: The (bin, junction) pairs whose counts changed.
+        """
+        times, junctions = table.columns["timeOfDay"], table.columns["JunctionName"]
+        if start:
+            times, junctions = times[start:], junctions[start:]  # Only the rows added since the last fold
+        keys = map(add, map(mul, map(floordiv, times, repeat(self.bin_seconds)), repeat(256)), junctions)
+        junction_names = table.labels["JunctionName"]
+        targets = [self.column(name) for name in junction_names]  # Count array of each junction code
+        changed = []
+        for key, count in Counter(keys).items():
+            bin_index, code = divmod(key, 256)  # Split the key back into bin and junction code
+            targets[code][bin_index] += count
+            changed.append((bin_index, junction_names[code]))
+        return changed
+
+    def copy(self):
+        """
+        Returns an independent copy of the counts.
+        """
+        counts = TrafficCounts(self.bin_seconds)
+        counts.columns = {junction: array("L", column) for junction, column in self.columns.items()}
+        return counts
+
+    def merge(self, other):
+        """
+        Adds the counts of another TrafficCounts with the same bin width.
+        """
+        if other.bin_seconds != self.bin_seconds:
+            raise ValueError("Cannot merge counts with different bin widths.")
+        for junction, counts in other.columns.items():
+            column = self.column(junction)
+            column[:] = array("L", map(add, column, counts))
+
+    def count(self, bin_index, junction):
+        """
+        Returns the number of vehicles for a bin and junction.
+        """
+        counts = self.columns.get(junction)
+        return counts[bin_index] if counts is not None else 0
+
+    def max(self):
+        """
+        Returns the highest count of any bin for any junction.
+        """
+        return max((max(counts) for counts in self.columns.values()), default=0)
+
+    def total(self):
+        """
+        Returns the number of vehicles counted across all bins and junctions.
+        """
+        return sum(sum(counts) for counts in self.columns.values())
+
+
+#Speed Analytics
+class SpeedAnalytics:
+    """
+    Speed and speed-limit compliance statistics per junction and vehicle type.
+    For every (junction, vehicle type) pair it keeps a histogram of vehicle
+    speeds, the number of vehicles over the junction's speed limit and the
+    number of electric hybrids. Speeds are whole numbers below 256, so the
+    histograms give exact percentiles in a fixed amount of memory however
+    many days are added, and merging two days is just adding histograms.
+    """
+    MAX_SPEED = 256  # VehicleSpeed is stored as an unsigned byte
+    PERCENTILES = (50, 85, 95)
+
+    def __init__(self):
+        self.speeds = {}  # (junction, vehicle type) -> array of vehicle counts per speed
+        self.speeding = Counter()  # (junction, vehicle type) -> vehicles over the speed limit
+        self.electric_hybrid = Counter()  # (junction, vehicle type) -> electric hybrid vehicles
+
+    @classmethod
+    def from_files(cls, file_paths, chunk_size=TrafficTable.CHUNK_SIZE, quarantine_dir=None):
+        """
+        Streams survey files chunk by chunk and returns their combined statistics.
+        With a quarantine_dir, bad rows are left out and written there.
+        """
+        analytics = cls()
+        for file_path in file_paths:
+            validator = SurveyValidator.for_file(file_path, quarantine_dir) if quarantine_dir else None
+            with open_survey(file_path, "r") as file:
+                for chunk in TrafficTable.iter_chunks(file, chunk_size, validator):
+                    analytics.fold_table(chunk)
+            if validator is not None and validator.quarantined:
+                print(f"Left out {validator.quarantined} bad rows of {file_path}, see {validator.quarantine_path}")
+        return analytics
+
+    def fold_table(self, table):
+        """
+        Adds the vehicles of a traffic table in one columnar pass.
+        The junction code, vehicle type code and speed of each row are combined
+        into one integer key and counted with C-level iterators; speeding and
+        electric hybrid vehicles are counted by filtering the same pair keys.
+        """
+        columns = table.columns
+        pairs = array("H", map(add, map(mul, columns["JunctionName"], repeat(256)), columns["VehicleType"]))
+        speed_keys = map(add, map(mul, pairs, repeat(self.MAX_SPEED)), columns["VehicleSpeed"])
+        junction_names = table.labels["JunctionName"]
+        type_names = table.labels["VehicleType"]
+
+        def decode(pair):
+            return junction_names[pair >> 8], type_names[pair & 255]
+
+        for key, count in Counter(speed_keys).items():
+            pair, speed = divmod(key, self.MAX_SPEED)
+            group = decode(pair)
+            histogram = self.speeds.get(group)
+            if histogram is None:
+                histogram = self.speeds[group] = array("L", bytes(self.MAX_SPEED * array("L").itemsize))
+            histogram[speed] += count
+        over_limit = map(gt, columns["VehicleSpeed"], columns["JunctionSpeedLimit"])
+        for pair, count in Counter(compress(pairs, over_limit)).items():
+            self.speeding[decode(pair)] += count
+        for pair, count in Counter(compress(pairs, table.hybrid_flags())).items():
+            self.electric_hybrid[decode(pair)] += count
+
+    def merge(self, other):
+        """
+        Adds the statistics of another SpeedAnalytics, e.g. of another day.
+        """
+        for group, histogram in other.speeds.items():
+            mine = self.speeds.get(group)
+            if mine is None:
+                self.speeds[group] = array("L", histogram)
+            else:
+                mine[:] = array("L", map(add, mine, histogram))
+        self.speeding.update(other.speeding)
+        self.electric_hybrid.update(other.electric_hybrid)
+
+    def summary(self, by=None):
+        """
+        Returns the statistics for every vehicle, or broken down by junction or vehicle type.
+
+        Args:
+            by (str): None for one overall group, "junction" or "vehicle_type".
+
+        Returns:
+            dict: Group name -> vehicles, speeding count and share, speed percentiles
+                  (p50, p85, p95), mean speed and electric hybrid share.
+        """
+        if by not in (None, "junction", "vehicle_type"):
+            raise ValueError(f"Unknown breakdown {by!r}; expected 'junction' or 'vehicle_type'.")
+        groups = {}
+        for group, histogram in self.speeds.items():
+            name = "all" if by is None else group[0] if by == "junction" else group[1]
+            totals = groups.setdefault(name, {"histogram": [0] * self.MAX_SPEED, "speeding": 0, "electric_hybrid": 0})
+            totals["histogram"] = list(map(add, totals["histogram"], histogram))
+            totals["speeding"] += self.speeding[group]
+            totals["electric_hybrid"] += self.electric_hybrid[group]
+        result = {}
+        for name, totals in sorted(groups.items()):
+            histogram = totals["histogram"]
+            vehicles = sum(histogram)
+            stats = {
+                "vehicles": vehicles,
+                "speeding": totals["speeding"],
+                "speeding_share": totals["speeding"] / vehicles if vehicles else 0.0,
+                "mean_speed": sum(map(mul, histogram, range(self.MAX_SPEED))) / vehicles if vehicles else 0.0,
+                "electric_hybrid_share": totals["electric_hybrid"] / vehicles if vehicles else 0.0,
+            }
+            for percentile in self.PERCENTILES:
+                stats[f"p{percentile}"] = self.percentile(histogram, percentile)
+            result[name] = stats
+        return result
+
+    @staticmethod
+    def percentile(histogram, percentile):
+        """
+        Returns the nearest-rank percentile of a speed histogram, or None if it is empty.
+        """
+        vehicles = sum(histogram)
+        if not vehicles:
+            return None
+        rank = max(-(-vehicles * percentile // 100), 1)  # Position of the percentile vehicle, rounded up
+        seen = 0
+        for speed, count in enumerate(histogram):
+            seen += count
+            if seen >= rank:
+                return speed
+
+
+#Caching
+class DayCache:
+    """
+    On-disk cache of parsed survey days in a compact binary columnar format.
+    Each cache file holds a small JSON header followed by the raw column
+    buffers of a TrafficTable. Repeat loads memory-map the file and view the
+    columns in place instead of re-parsing the CSV text. Entries are
+    invalidated when the CSV's modification time or size changes, and the
+    least recently used entries are evicted once the cache exceeds max_bytes.
+    """
+    MAGIC = b"TDC1"  # Identifies a cache file and its format version
+    HEADER = struct.Struct("<4sI")  # Magic and the length of the JSON header
+    SUFFIX = ".tdc"
+
+    def __init__(self, cache_dir=".traffic_cache", max_bytes=256 * 1024 * 1024):
+        """
+        Initializes the cache.
+
+        Args:
+            cache_dir (str): The directory holding the cache files.
+            max_bytes (int): The total size of cache files kept before evicting old days.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def cache_path(self, file_path):
+        """
+        Returns the cache file path used for a CSV file.
+        """
+        digest = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:12]
+        name = survey_name(file_path)
+        return os.path.join(self.cache_dir, f"{name}-{digest}{self.SUFFIX}")
+
+    def load(self, file_path):
+        """
+        Returns the cached table for a CSV file, or None if there is no valid entry.
+        A missing, stale, truncated or corrupt entry is treated as a miss.
+        Raises FileNotFoundError if the CSV file itself does not exist.
+        """
+        stat = os.stat(file_path)
+        path = self.cache_path(file_path)
+        try:
+            with open(path, "rb") as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None  # No entry yet, or an empty file left by a failed write
+        try:
+            magic, header_length = self.HEADER.unpack_from(buffer)
+            if magic != self.MAGIC or self.HEADER.size + header_length > len(buffer):
+                return None  # Not a cache file, or cut off inside its header
+            header = json.loads(buffer[self.HEADER.size:self.HEADER.size + header_length])
+            if header["mtime_ns"] != stat.st_mtime_ns or header["size"] != stat.st_size:
+                return None  # The CSV has changed since it was cached
+            view = memoryview(buffer)
+            row_count = header["row_count"]
+            columns = {}
+            for name, typecode, offset, length in header["columns"]:
+                if array(typecode).itemsize != header["itemsizes"][typecode]:
+                    return None  # Written on a platform with different integer sizes
+                if offset + length > len(buffer) or length != row_count * array(typecode).itemsize:
+                    return None  # Truncated, or a column of the wrong length
+                columns[name] = view[offset:offset + length].cast(typecode)
+            offset, length = header["electric_hybrid"]
+            if offset + length > len(buffer) or length < (row_count + 7) // 8:
+                return None
+            table = TrafficTable.from_buffers(row_count, header["labels"], columns, view[offset:offset + length])
+        except (struct.error, ValueError, KeyError, TypeError):
+            return None  # A corrupt entry, e.g. a bad header, is parsed again from the CSV
+        os.utime(path)  # Mark the entry as recently used
+        return table
+
+    def store(self, file_path, table):
+        """
+        Writes a table to the cache entry of a CSV file and evicts old entries.
+        """
+        stat = os.stat(file_path)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        buffers = [(name, column.typecode if isinstance(column, array) else column.format, bytes(column))
+                   for name, column in table.columns.items()]
+        header = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "row_count": table.row_count,
+            "labels": table.labels,
+            "itemsizes": {typecode: array(typecode).itemsize for _, typecode, _ in buffers},
+            "columns": [],
+        }
+        # Lay out the buffers after the header, each aligned to 8 bytes
+        header_length = 4096
+        while True:
+            offset = self._align(self.HEADER.size + header_length)
+            header["columns"] = []
+            for name, typecode, data in buffers:
+                header["columns"].append((name, typecode, offset, len(data)))
+                offset = self._align(offset + len(data))
+            header["electric_hybrid"] = (offset, len(table.electric_hybrid))
+            encoded = json.dumps(header).encode()
+            if len(encoded) <= header_length:
+                break
+            header_length = len(encoded)  # Grow the header space and lay out again
+        path = self.cache_path(file_path)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")  # One per writer
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(self.HEADER.pack(self.MAGIC, len(encoded)))
+                file.write(encoded.ljust(header_length))
+                for (name, typecode, offset, _), (_, _, data) in zip(header["columns"], buffers):
+                    file.seek(offset)
+                    file.write(data)
+                file.seek(header["electric_hybrid"][0])
+                file.write(table.electric_hybrid)
+            os.replace(temp_path, path)  # Replace the old entry in one step
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """
+        Deletes the least recently used cache files until the cache fits in max_bytes.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(self.SUFFIX)]
+        except FileNotFoundError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime_ns)  # Oldest first
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry.path != keep:
+                total -= entry.stat().st_size
+                os.remove(entry.path)
+
+    @staticmethod
+    def _align(offset):
+        return (offset + 7) & ~7
+
+
+#Live Data
+class CSVTail:
+    """
+    Follows a CSV file that is still being appended to.
+    Each call to read_new reads only the bytes added since the previous call
+    and parses the complete rows among them; a trailing partial row is left
+    for the next call. Every row is checked by a SurveyValidator, so bad rows,
+    e.g. written by an interrupted logger, are skipped and counted.
+    """
+    BLOCK_SIZE = 1 << 20  # Bytes read from the file at a time
+
+    def __init__(self, file_path, quarantine_dir=None):
+        self.file_path = file_path
+        self.quarantine_dir = quarantine_dir
+        self.offset = 0  # Byte offset just after the last complete row read
+        self.header = None  # Column names, read from the first line of the file
+        self.validator = SurveyValidator.for_file(file_path, quarantine_dir)  # Checks the new rows
+
+    @property
+    def skipped(self):
+        """
+        Returns the number of bad rows left out since the file was last read from the start.
+        """
+        return self.validator.quarantined
+
+    def read_new(self):
+        """
+        Reads the rows appended to the file since the last call.
+        If the new rows cannot be read, the error is raised and the tail is
+        rewound, so the same rows are read again by the next call.
+
+        Returns:
+            tuple: A TrafficTable of the new rows, and True if the file was truncated
+                   or replaced so that it was read again from the start.
+        """
+        position = self.position()
+        restarted = False
+        try:
+            if os.path.getsize(self.file_path) < self.offset:
+                self.offset, self.header, restarted = 0, None, True  # The file was rotated or rewritten
+                self.validator = SurveyValidator.for_file(self.file_path, self.quarantine_dir)
+            table = TrafficTable()
+            table.validator = self.validator
+            with open(self.file_path, "rb") as file:
+                file.seek(self.offset)
+                pending = b""
+                while True:
+                    block = file.read(self.BLOCK_SIZE)
+                    if not block:
+                        break
+                    block = pending + block
+                    end = block.rfind(b"\n") + 1  # Only parse up to the last complete row
+                    pending = block[end:]
+                    lines = block[:end].decode().splitlines()
+                    self.offset += end
+                    if self.header is None and lines:
+                        self.header = next(csv.reader([lines.pop(0)]))
+                    rows = [row for row in csv.reader(lines) if row]
+                    if rows:
+                        table.append_rows(self.header, rows)
+        except Exception:
+            self.rewind(position)
+            raise
+        return table, restarted
+
+    def position(self):
+        """
+        Returns the read position and validator counts, to go back to with rewind.
+        """
+        validator = self.validator
+        return self.offset, self.header, validator, (validator.rows_seen, validator.quarantined,
+                                                     Counter(validator.reasons))
+
+    def rewind(self, position):
+        """
+        Goes back to a position returned by position, so the rows after it are read (and counted) again.
+        """
+        self.offset, self.header, self.validator, counts = position
+        self.validator.rows_seen, self.validator.quarantined, self.validator.reasons = counts
+
+
+class BackgroundLoader:
+    """
+    Loads and aggregates a survey file on a worker thread.
+    The file is read in blocks of complete lines; after each block the running
+    counts are copied and put on a queue together with the fraction of the
+    file read, so the Tk thread can draw partial histograms while the rest of
+    the file is parsed. Given a DayCache, the parsed rows are kept and stored
+    in it once the whole file is read, so the next view of the day is mapped
+    from the cache instead.
+    """
+    BLOCK_SIZE = 1 << 20  # Bytes parsed between progress updates
+
+    def __init__(self, file_path, bin_seconds=3600, quarantine_dir=None, cache=None):
+        self.file_path = file_path
+        self.bin_seconds = bin_seconds
+        self.cache = cache
+        self.validator = SurveyValidator.for_file(file_path, quarantine_dir) if quarantine_dir else None
+        self.queue = queue.Queue()  # ("progress" | "done", counts, fraction) or ("error", error, None)
+        self.cancelled = threading.Event()  # Set when the results are no longer wanted
+        self.thread = threading.Thread(target=self.work, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        """
+        Stops the worker after the block it is parsing.
+        """
+        self.cancelled.set()
+
+    def work(self):
+        """
+        Reads the file block by block, putting a snapshot of the counts on the queue after each block.
+        """
+        try:
+            counts = TrafficCounts(self.bin_seconds)
+            total = os.path.getsize(self.file_path) or 1
+            with INSTRUMENTATION.stage("load", file=self.file_path, background=True) as record, \
+                    open(self.file_path, "rb") as raw, open_decompressed(self.file_path, raw) as file:
+                header_line = file.readline()
+                header = next(csv.reader([header_line.decode()]), [])
+                pending = b""
+                table = TrafficTable()  # Holds every row when they are cached, otherwise only the last block
+                table.validator = self.validator  # Bad rows are left out of the counts
+                while header:
+                    if self.cancelled.is_set():
+                        return
+                    block = file.read(self.BLOCK_SIZE)
+                    data = pending + block
+                    end = len(data) if not block else data.rfind(b"\n") + 1  # Keep a partial last line for later
+                    pending = data[end:]
+                    if self.cache is None:
+                        table = TrafficTable()
+                        table.validator = self.validator
+                    start = len(table)
+                    table.append_block(header, data[:end])
+                    counts.fold_table(table, start)
+                    if not block:
+                        break
+                    self.queue.put(("progress", counts.copy(), raw.tell() / total))  # Share of the file on disk read
+                record["rows"] = counts.total()
+            self.queue.put(("done", counts, 1.0))
+        except Exception as error:  # Any failure must reach poll_loader, or it would wait forever
+            self.queue.put(("error", error, None))
+            return
+        if self.cache is not None and header:
+            try:
+                self.cache.store(self.file_path, table)  # Map the day from the cache next time
+            except OSError as error:
+                print(f"Could not cache {self.file_path}: {error}")
+
 
 #Task D
 class HistogramApp:
-    def __init__(self, traffic_data, date):
+    LEGEND_ROWS = 4  # Junctions listed per legend column, which fit above the tallest bar
+
+    def __init__(self, traffic_data, date, bin_seconds=3600, counts=None, follow_path=None, refresh_ms=2000,
+                 load_path=None, quarantine_dir=None, registry=None, cache=None):
+        """
+        Initializes the histogram application with the traffic data and selected date.
+        - traffic_data: TrafficTable containing the vehicle data.
+        - date: The date of the traffic survey.
+        - bin_seconds: The width of each histogram bin in seconds (e.g., 900 for 15 minutes).
+        - counts: Already aggregated TrafficCounts, used instead of traffic_data when given.
+        - follow_path: CSV file to follow in live mode, updating the histogram as rows are appended.
+        - refresh_ms: How often the followed file is checked for new rows, in milliseconds.
+        - load_path: CSV file to load on a background thread after the window opens, drawing partial results.
+        - quarantine_dir: Validate background loads and write bad rows here, or None to not validate.
+        - registry: JunctionRegistry giving each junction its colour and position, shared between windows.
+        - cache: DayCache that background loads store the parsed file in, or None to not cache them.
+        """
+        self.traffic_data = traffic_data  # Store the traffic data
+        self.date = date  # Store the selected date
+        self.bin_seconds = bin_seconds  # Store the bin width
+        self.counts = counts  # Store the pre-aggregated counts, if any
+        self.hourly_data = None  # Will hold the counts drawn in the histogram
+        self.bar_items = {}  # (bin, junction) -> canvas ids of the bar and its count label
+        self.hour_items = []  # Canvas ids of the hour labels
+        self.static_items = {}  # Canvas ids of the title, axis label and x-axis
+        self.legend_items = []  # Canvas ids of the legend
+        self.scene_key = None  # Junctions, number of bins and number of slots the items were created for
+        self.width, self.height = 1000, 600  # Size of the canvas
+        self.tail = CSVTail(follow_path, quarantine_dir) if follow_path else None  # Follows the live file, if any
+        self.refresh_ms = refresh_ms
+        self.load_path = load_path
+        self.quarantine_dir = quarantine_dir
+        self.registry = registry if registry is not None else JunctionRegistry()  # Colours and positions of junctions
+        self.cache = cache
+        if load_path is not None:
+            self.counts = TrafficCounts(bin_seconds)  # Start with an empty histogram
+        self.loader = None  # BackgroundLoader of the file being loaded, if any
+        self.on_loaded = None  # Called with the counts once the background load finishes
+        self.progress_item = None  # Canvas id of the loading progress text
+        self.root = None  # Will hold the main window, created when the window is set up
+        self.canvas = None  # Will hold the canvas for drawing the histogram
+
+    def setup_window(self):
+        """
+        Sets up the Tkinter window and canvas for drawing the histogram.
+        The window will display the title and contain a canvas to draw on.
+        """
+        import tkinter as tk  # Imported here so that headless runs never load Tk
+        self.root = tk.Tk()  # Create the main window for the application
+        self.root.title(self.title_text())  # Set the window title
+        # Create a canvas widget where the histogram will be drawn
+        self.canvas = tk.Canvas(self.root, width=self.width, height=self.height, bg="#E9F4E9", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)  # Add the canvas to the window, growing with it
+        self.canvas.bind("<Configure>", self.on_resize)  # Lay the histogram out again when resized
+
+    def aggregate_data(self):
+        """
+        Aggregates the traffic data by time bin and junction.
+        This function counts the vehicles in the 'timeOfDay' and 'JunctionName'
+        columns of the traffic table in one batched pass, covering every junction
+        found in the data. It returns the counts for each bin and junction.
+        
+        Returns:
+            TrafficCounts: The vehicle counts for each time bin and junction.
+        """
+        if self.tail is not None and self.counts is None:
+            self.counts = TrafficCounts(self.bin_seconds)
+            self.counts.fold_table(self.tail.read_new()[0])  # Read what the live file holds so far
+        if self.counts is not None:
+            return self.counts  # The data was already aggregated while streaming
+        with INSTRUMENTATION.stage("aggregate", rows=len(self.traffic_data)):
+            return TrafficCounts.from_table(self.traffic_data, self.bin_seconds)  # Return the aggregated data
+
+
+
+    def find_max_vehicles(self, hourly_data):
+        """
+        Finds the maximum number of vehicles recorded in any bin across all junctions.
+        This helps in scaling the histogram bars based on the highest count.
+        
+        Returns:
+            int: The maximum number of vehicles recorded in any bin.
+        """
+        with INSTRUMENTATION.stage("scale"):
+            return hourly_data.max()  # Return the maximum number of vehicles
+
+
+    def draw_histogram(self):
+        """
+        Draws the histogram with axes, labels, and bars for each time bin.
+        It visualizes the frequency of vehicles passing through each junction per bin.
+        The canvas items are created once and kept in self.bar_items, keyed by
+        (bin, junction); drawing again with the same junctions and bins only
+        moves and relabels the existing items.
+        """
+        #self.draw_axes()
+        hourly_data = self.hourly_data = self.aggregate_data()  # Get the aggregated data
+        self.max_vehicles = self.find_max_vehicles(hourly_data)  # Get the maximum number of vehicles
+        junctions = self.registry.order(hourly_data.junctions)  # Junctions in the order their bars are drawn
+        scene_key = (tuple(junctions), hourly_data.n_bins, self.registry.slot_count())
+        with INSTRUMENTATION.stage("draw", items=len(junctions) * hourly_data.n_bins * 2):
+            if self.bar_items and scene_key == self.scene_key:
+                self.layout()  # The items already exist, so just move them
+            else:
+                self.build_scene(scene_key)
+
+    def build_scene(self, scene_key):
+        """
+        Creates the canvas items of the histogram for a set of junctions and number of bins.
+        """
+        self.clear_scene()
+        self.scene_key = scene_key
+        self.update_geometry()
+        hourly_data = self.hourly_data
+        junctions = scene_key[0]
+
+        # Loop through each bin and draw bars for each junction
+        for bin_index in range(hourly_data.n_bins):
+            # Loop through each junction and draw a bar for its vehicle count
+            for junction in junctions:
+                i = self.registry.slot(junction)  # The junction's position within every bin
+                count = hourly_data.count(bin_index, junction)
+                # Draw the bar for this junction
+                bar = self.canvas.create_rectangle(
+                    *self.bar_coords(bin_index, i, count),  # Edges of the bar
+                    fill=self.registry.color(junction),  # The junction's colour from the registry
+                    outline="black"  # Outline color for the bars
+                )
+
+                # Add the count value above the bar, hidden when there is no room for it
+                label = self.canvas.create_text(
+                    *self.label_coords(bin_index, i, count),  # Position of the text
+                    text=str(count),  # Display the count value
+                    font=("Arial", 8),  # Font style for the text
+                    fill="blue", # Color for the text
+                    state=self.label_state()
+                )
+                self.bar_items[(bin_index, junction)] = (bar, label)
+
+
+        # Draw the hour labels at the bottom of the histogram
+        for hour in range(24):
+            self.hour_items.append(self.canvas.create_text(*self.hour_label_coords(hour), text=str(hour).zfill(2)))
+
+            
+        # Draw the title and axis labels
+        static_coords = self.static_coords()
+        self.static_items["title"] = self.canvas.create_text(
+            *static_coords["title"], text=self.title_text(), font=("Arial", 14, "bold")
+        )
+        self.static_items["axis_label"] = self.canvas.create_text(
+            *static_coords["axis_label"], text="Hours 00:00 to 24:00", font=("Arial", 12)
+        )
+        self.static_items["axis"] = self.canvas.create_line(*static_coords["axis"], width=2)  # X-axis
+        
+        
+        
+    def title_text(self):
+        """
+        Returns the histogram title, with the date formatted as DD/MM/YYYY.
+        A file not named after its date is titled with its name instead.
+        """
+        date = self.date
+        if len(date) == 8 and date.isdigit():
+            date = f"{date[:2]}/{date[2:4]}/{date[4:]}"
+        return f"Histogram of Vehicle Frequency per Hour ({date})"
+
+    def clear_scene(self):
+        """
+        Deletes the bar, label and axis items of the histogram from the canvas.
+        """
+        for bar, label in self.bar_items.values():
+            self.canvas.delete(bar, label)
+        for item in self.hour_items + list(self.static_items.values()):
+            self.canvas.delete(item)
+        self.bar_items, self.hour_items, self.static_items = {}, [], {}
+
+    def update_geometry(self):
+        """
+        Works out the bar sizes for the current canvas size, number of bins and junction slots.
+        Every slot of the registry gets a position, so a junction missing on a day leaves a gap.
+        """
+        self.group_width = (self.width - 40) / self.hourly_data.n_bins  # Width of the bars and gap for one bin
+        self.bar_width = (self.group_width * 3 / 4) / max(self.scene_key[2], 1)  # Width of each bar
+        self.baseline = self.height - 50  # y position for the bottom of the bars
+        self.bar_area = self.baseline - 150  # Height of the tallest bar
+
+    def bar_coords(self, bin_index, i, count):
+        """
+        Returns the left, top, right and bottom edges of a bar.
+
+        Args:
+            bin_index (int): The time bin of the bar.
+            i (int): The layout slot of the bar's junction within the bin.
+            count (int): The number of vehicles the bar shows.
+        """
+        y_scale = self.bar_area / self.max_vehicles if self.max_vehicles > 0 else 1  # Scale the bars based on the max vehicles
+        x_left = 50 + bin_index * self.group_width + i * self.bar_width  # Bars start at x = 50
+        return x_left, self.baseline - count * y_scale, x_left + self.bar_width, self.baseline
+
+    def label_coords(self, bin_index, i, count):
+        """
+        Returns the position of the count label above a bar.
+        """
+        x_left, top = self.bar_coords(bin_index, i, count)[:2]
+        return x_left + self.bar_width // 2, top - 10
+
+    def label_state(self):
+        """
+        Returns the state of the count labels: hidden when the bars are too narrow for them.
+        """
+        return "normal" if self.bar_width >= 12 else "hidden"
+
+    def hour_label_coords(self, hour):
+        """
+        Returns the position of the label below the start of an hour, which may fall inside a bin
+        when bins are wider than an hour or do not divide it.
+        """
+        bins_per_hour = 3600 / self.hourly_data.bin_seconds
+        return 50 + hour * bins_per_hour * self.group_width + self.bar_width // 2, self.baseline + 10
+
+    def static_coords(self):
+        """
+        Returns the positions of the title, axis label and x-axis.
+        """
+        return {
+            "title": (265, 20),
+            "axis_label": (self.width / 2 + 15, self.height - 8),
+            "axis": (50, self.baseline, self.width, self.baseline),
+        }
+
+    def layout(self):
+        """
+        Moves every existing item to fit the current canvas size and scale.
+        """
+        self.update_geometry()
+        self.update_bars(self.bar_items)
+        state = self.label_state()
+        for bar, label in self.bar_items.values():
+            self.canvas.itemconfig(label, state=state)
+        for hour, item in enumerate(self.hour_items):
+            self.canvas.coords(item, *self.hour_label_coords(hour))
+        for name, coords in self.static_coords().items():
+            self.canvas.coords(self.static_items[name], *coords)
+
+    def on_resize(self, event):
+        """
+        Lays the histogram out again when the window is resized.
+        """
+        if (event.width, event.height) != (self.width, self.height):
+            self.width, self.height = event.width, event.height
+            if self.bar_items:
+                self.layout()
+
+    def update_bars(self, keys):
+        """
+        Moves and relabels existing bars after their counts changed.
+
+        Args:
+            keys: The (bin, junction) pairs of the bars to update.
+        """
+        for bin_index, junction in keys:
+            bar, label = self.bar_items[(bin_index, junction)]
+            count = self.hourly_data.count(bin_index, junction)
+            i = self.registry.slot(junction)
+            self.canvas.coords(bar, *self.bar_coords(bin_index, i, count))
+            self.canvas.coords(label, *self.label_coords(bin_index, i, count))
+            self.canvas.itemconfig(label, text=str(count))
+
+    def set_counts(self, counts):
+        """
+        Shows new counts, reusing the existing items when the junctions and bins are unchanged.
+        """
+        junctions = self.scene_key[0] if self.scene_key else None
+        self.counts = counts
+        self.draw_histogram()
+        if self.scene_key[0] != junctions:
+            self.add_legend()  # The legend lists the junctions, so it changes with them
+
+    def refresh(self):
+        """
+        Folds the rows appended to the live file into the counts and updates only
+        the bars that changed, then schedules the next refresh. A read that fails
+        is shown on the canvas, leaves the counts and bars as they were, and is
+        tried again at the next refresh.
+        """
+        position = self.tail.position()
+        try:
+            table, restarted = self.tail.read_new()
+            counts = TrafficCounts(self.bin_seconds) if restarted else self.counts.copy()
+            changed = counts.fold_table(table)  # Folded into a copy, so a failure changes nothing on screen
+        except Exception as error:
+            self.tail.rewind(position)  # Read the same rows again next time
+            self.show_progress(0.0, f"Could not read the file: {error}")
+            self.root.after(self.refresh_ms, self.refresh)
+            return
+        try:
+            self.counts = self.hourly_data = counts  # The bars are updated from the new counts together
+            if restarted or tuple(self.registry.order(self.counts.junctions)) != self.scene_key[0]:
+                self.set_counts(self.counts)  # A new junction changes the bar layout
+            elif self.counts.max() != self.max_vehicles:
+                self.max_vehicles = self.counts.max()  # The scale changed, so every bar moves
+                self.update_bars(self.bar_items)
+            elif changed:
+                self.update_bars(changed)
+            if self.tail.skipped:
+                self.show_progress(1.0, f"Skipped {self.tail.skipped} bad rows")
+            elif self.progress_item is not None:
+                self.canvas.delete(self.progress_item)  # The file could be read again
+                self.progress_item = None
+        finally:
+            self.root.after(self.refresh_ms, self.refresh)
+
+    def add_legend(self):
+        """
+        Adds a legend to the histogram to indicate which bar corresponds to which junction.
+        This helps users identify which color represents each junction.
+        """
+        for item in self.legend_items:
+            self.canvas.delete(item)  # Remove the legend of the previous junctions
+        self.legend_items = []
+        junctions = self.scene_key[0]
+        columns = -(-len(junctions) // self.LEGEND_ROWS)  # Extra columns once the first one is full
+        column_width = min(200, (self.width - 60) / max(columns, 1))
+        for i, junction in enumerate(junctions):
+            x = 48 + (i // self.LEGEND_ROWS) * column_width
+            y = 70 + (i % self.LEGEND_ROWS) * 20
+            self.legend_items.append(self.canvas.create_rectangle(x, y, x+10, y+10, fill=self.registry.color(junction)))
+            self.legend_items.append(self.canvas.create_text(x+14, y+5, text=junction, anchor='w'))
+
+    def run(self):
+        """
+        Runs the Tkinter main loop to display the histogram.
+        This method initializes the window, draws the histogram, adds the legend, 
+        and starts the Tkinter event loop to display the GUI.
+        """
+        self.open_window()
+        self.root.mainloop()  # Start the Tkinter main loop
+
+    def open_window(self):
+        """
+        Creates the window, draws the histogram and legend, and schedules the
+        live refresh and background load, without entering the main loop.
+        """
+        started = time.perf_counter()
+        self.setup_window()  # Set up the window and canvas
+        self.draw_histogram()  # Draw the histogram
+        self.add_legend()  # Add the legend to the histogram
+        if INSTRUMENTATION.enabled:
+            # Report when the event loop first goes idle, i.e. the histogram is on screen
+            self.root.after_idle(lambda: INSTRUMENTATION.emit(
+                {"stage": "mainloop-ready", "date": self.date, "seconds": time.perf_counter() - started}))
+        if self.tail is not None:
+            self.root.after(self.refresh_ms, self.refresh)  # Check the live file for new rows
+        if self.load_path is not None:
+            self.load_in_background(self.load_path)  # Parse the file while the window is already on screen
+
+    def load_in_background(self, file_path, on_loaded=None):
+        """
+        Starts loading a file on a worker thread, replacing any load in progress.
+
+        Args:
+            file_path (str): The survey file to load.
+            on_loaded: Called with the final TrafficCounts once the whole file is loaded.
+        """
+        self.cancel_load()
+        loader = self.loader = BackgroundLoader(file_path, self.bin_seconds, self.quarantine_dir, self.cache)
+        self.on_loaded = on_loaded
+        self.show_progress(0.0)
+        loader.start()
+        self.root.after(50, self.poll_loader, loader)
+
+    def cancel_load(self):
+        """
+        Stops the background load in progress, if any, and removes its progress text.
+        """
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+        if self.progress_item is not None:
+            self.canvas.delete(self.progress_item)
+            self.progress_item = None
+
+    def show_day(self, date, counts):
+        """
+        Switches the window to another date, moving the existing bars to its counts.
+        """
+        self.cancel_load()
+        self.date = date
+        self.root.title(self.title_text())
+        if "title" in self.static_items:
+            self.canvas.itemconfig(self.static_items["title"], text=self.title_text())
+        self.set_counts(counts)
+
+    def show_progress(self, fraction, text=None):
+        """
+        Shows how much of the file has been loaded in the top right corner of the canvas.
+        """
+        text = text or f"Loading... {fraction:.0%}"
+        if self.progress_item is None:
+            self.progress_item = self.canvas.create_text(self.width - 20, 20, text=text, anchor="e",
+                                                         font=("Arial", 10), fill="gray30")
+        else:
+            self.canvas.itemconfig(self.progress_item, text=text)
+
+    def poll_loader(self, loader):
+        """
+        Takes the latest results of the background loader off its queue and draws them,
+        then checks again shortly unless loading has finished.
+        """
+        if loader is not self.loader:
+            return  # The load was cancelled or replaced
+        latest = None
+        try:
+            while True:
+                latest = loader.queue.get_nowait()  # Skip to the newest snapshot
+                if latest[0] != "progress":
+                    break
+        except queue.Empty:
+            pass
+        if latest is None:
+            self.root.after(50, self.poll_loader, loader)
+            return
+        kind, result, fraction = latest
+        if kind == "error":
+            self.show_progress(0.0, f"Could not load the file: {result}")
+            self.loader = None
+            return
+        self.set_counts(result)
+        if kind == "done":
+            self.cancel_load()  # Loading finished, so remove the progress text
+            if loader.validator is not None and loader.validator.quarantined:
+                self.show_progress(1.0, f"Left out {loader.validator.quarantined} bad rows, "
+                                        f"see {loader.validator.quarantine_path}")
+            if self.on_loaded is not None:
+                self.on_loaded(result)
+        else:
+            self.show_progress(fraction)
+            self.root.after(50, self.poll_loader, loader)
+
+    def render_to_file(self, path):
+        """
+        Draws the histogram and legend onto an SVGCanvas and saves it as an image,
+        without creating a Tkinter window.
+        """
+        self.canvas = SVGCanvas(width=self.width, height=self.height, bg="#E9F4E9")
+        self.draw_histogram()  # Draw the histogram
+        self.add_legend()  # Add the legend to the histogram
+        self.canvas.save(path)
+
+
+
+
+#Viewer Session
+class ViewerSession:
+    """
+    One long-lived histogram window for browsing the survey days of a catalog.
+    A date picker above the canvas lists the available days. Switching days
+    reuses the same Tk root and canvas items, and the aggregated counts of the
+    most recently viewed days are kept in memory so that going back to one of
+    them redraws instantly.
+    """
+    def __init__(self, catalog, bin_seconds=3600, cache=None, use_rollups=False, max_days=32, columnar_store=None,
+                 quarantine_dir=None, database=None, registry=None):
+        """
+        Initializes the session.
+
+        Args:
+            catalog (DataCatalog): The survey files to browse.
+            bin_seconds (int): The width of each histogram bin in seconds.
+            cache (DayCache): Binary cache of parsed days, or None to always parse the CSV.
+            use_rollups (bool): Draw hourly histograms from the files' rollup cubes instead of their rows.
+            max_days (int): The number of aggregated days kept in memory.
+            columnar_store (ColumnarStore): Exported Parquet/Arrow files to read days from, or None.
+            quarantine_dir (str): Validate loaded days and write bad rows here, or None to not validate.
+            database (SurveyDatabase): SQLite store to read days from, or None.
+            registry (JunctionRegistry): Colours and positions of the junctions, or None to assign them as they appear.
+        """
+        self.catalog = catalog
+        self.bin_seconds = bin_seconds
+        self.cache = cache
+        self.use_rollups = use_rollups
+        self.max_days = max_days
+        self.columnar_store = columnar_store
+        self.quarantine_dir = quarantine_dir
+        self.database = database
+        self.registry = registry
+        self.days = OrderedDict()  # date -> (file modification time and size, TrafficCounts), oldest first
+        self.dates = [day.strftime("%d%m%Y") for day in catalog.dates()]  # DDMMYYYY, in order
+        self.app = None  # The HistogramApp drawing the window
+        self.picker = None  # The date picker widget
+
+    def run(self, date_input=None):
+        """
+        Opens the window on a date, the first available one by default, and runs the Tkinter main loop.
+        """
+        from tkinter import ttk
+        date_input = date_input or self.dates[0]
+        self.app = HistogramApp(None, date_input, self.bin_seconds, counts=TrafficCounts(self.bin_seconds),
+                                quarantine_dir=self.quarantine_dir, registry=self.registry, cache=self.cache)
+        self.app.open_window()
+        toolbar = ttk.Frame(self.app.root)
+        toolbar.pack(side="top", fill="x", before=self.app.canvas)
+        ttk.Button(toolbar, text="<", width=3, command=lambda: self.step(-1)).pack(side="left")
+        self.picker = ttk.Combobox(toolbar, state="readonly", width=12,
+                                   values=[f"{d[:2]}/{d[2:4]}/{d[4:]}" for d in self.dates])
+        self.picker.pack(side="left")
+        self.picker.bind("<<ComboboxSelected>>", lambda event: self.select(self.dates[self.picker.current()]))
+        ttk.Button(toolbar, text=">", width=3, command=lambda: self.step(1)).pack(side="left")
+        self.app.root.bind("<Left>", lambda event: self.step(-1))
+        self.app.root.bind("<Right>", lambda event: self.step(1))
+        self.select(date_input)
+        self.app.root.mainloop()
+
+    def step(self, offset):
+        """
+        Shows the previous or next available date.
+        """
+        index = self.dates.index(self.app.date) + offset
+        if 0 <= index < len(self.dates):
+            self.select(self.dates[index])
+
+    def select(self, date_input):
+        """
+        Shows the histogram of a date, from memory if it was viewed recently.
+        """
+        file_path = self.catalog.resolve(date_input)
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        self.picker.current(self.dates.index(date_input))
+        entry = self.days.get(date_input)
+        if entry is not None and entry[0] == signature:
+            self.days.move_to_end(date_input)  # Most recently used
+            self.app.show_day(date_input, entry[1])
+            return
+        counts = self.cached_counts(date_input, file_path)
+        if counts is not None:
+            self.remember(date_input, signature, counts)
+            self.app.show_day(date_input, counts)
+            return
+        blank = TrafficCounts(self.bin_seconds)
+        for junction in self.app.scene_key[0]:
+            blank.column(junction)  # Keep the current bars, at zero, until the first block arrives
+        self.app.show_day(date_input, blank)
+        self.app.load_in_background(file_path, lambda counts: self.remember(date_input, signature, counts))
+
+    def cached_counts(self, date_input, file_path):
+        """
+        Returns the counts of a day from the columnar store, the database, its rollup cube or the day cache,
+        or None if none of them has it.
+        """
+        day = datetime.strptime(date_input, "%d%m%Y").date()
+        if self.columnar_store is not None and self.columnar_store.has(day):
+            return self.columnar_store.day_counts(day, self.bin_seconds)
+        if self.database is not None and self.database.has(day):
+            return self.database.day_counts(day, self.bin_seconds)
+        if self.use_rollups and self.bin_seconds == 3600:
+            return RollupCube.for_file(file_path).hourly_counts()
+        table = self.cache.load(file_path) if self.cache is not None else None
+        return TrafficCounts.from_table(table, self.bin_seconds) if table is not None else None
+
+    def remember(self, date_input, signature, counts):
+        """
+        Keeps the counts of a day in memory, forgetting the least recently viewed day when full.
+        """
+        self.days[date_input] = (signature, counts)
+        self.days.move_to_end(date_input)
+        while len(self.days) > self.max_days:
+            self.days.popitem(last=False)
+
+
+#Headless Rendering
+class SVGCanvas:
+    """
+    Stand-in for a Tkinter Canvas that records the drawn items and writes them
+    as an SVG image, so histograms can be rendered without opening a window.
+    Only the item types and options used by HistogramApp and the multi-day
+    views are supported.
+    """
+    def __init__(self, width=1000, height=600, bg="white"):
+        self.width = width
+        self.height = height
+        self.bg = bg
+        self.items = []  # SVG elements in drawing order
+
+    def create_rectangle(self, x0, y0, x1, y1, fill="", outline="black"):
+        self.items.append(
+            f'<rect x="{min(x0, x1):.2f}" y="{min(y0, y1):.2f}" width="{abs(x1 - x0):.2f}" '
+            f'height="{abs(y1 - y0):.2f}" fill="{fill or "none"}" stroke="{outline}"/>'
+        )
+        return len(self.items)
+
+    def create_line(self, x0, y0, x1, y1, *more, width=1, fill="black"):
+        if more:  # More than two points make a polyline
+            points = " ".join(f"{x:.2f},{y:.2f}" for x, y in zip(*[iter((x0, y0, x1, y1) + more)] * 2))
+            self.items.append(f'<polyline points="{points}" fill="none" stroke="{fill}" stroke-width="{width}"/>')
+        else:
+            self.items.append(
+                f'<line x1="{x0}" y1="{y0}" x2="{x1}" y2="{y1}" stroke="{fill}" stroke-width="{width}"/>'
+            )
+        return len(self.items)
+
+    def create_text(self, x, y, text="", font=("Arial", 10), fill="black", anchor="center", state="normal"):
+        if state == "hidden":
+            self.items.append("")  # Hidden items take an id but are not drawn
+            return len(self.items)
+        family, size = font[0], font[1]
+        weight = "bold" if "bold" in font[2:] else "normal"
+        compass = "" if anchor == "center" else anchor  # e.g. "ne" is the top right corner
+        text_anchor = "start" if "w" in compass else "end" if "e" in compass else "middle"
+        baseline = "hanging" if "n" in compass else "auto" if "s" in compass else "central"
+        self.items.append(
+            f'<text x="{x:.2f}" y="{y:.2f}" font-family="{family}" font-size="{size}pt" font-weight="{weight}" '
+            f'fill="{fill}" text-anchor="{text_anchor}" dominant-baseline="{baseline}">{html.escape(str(text))}</text>'
+        )
+        return len(self.items)
+
+    def create_image(self, x, y, image=b"", anchor="nw", width=None, height=None):
+        """
+        Embeds PNG image bytes with their top left corner at (x, y), scaled to width x height
+        without smoothing, so each pixel stays a sharp cell.
+        """
+        natural_width, natural_height = struct.unpack(">II", image[16:24])  # From the IHDR chunk
+        width, height = width or natural_width, height or natural_height
+        data = base64.b64encode(image).decode()
+        self.items.append(
+            f'<image x="{x:.2f}" y="{y:.2f}" width="{width:.2f}" height="{height:.2f}" preserveAspectRatio="none" '
+            f'style="image-rendering:pixelated" href="data:image/png;base64,{data}"/>'
+        )
+        return len(self.items)
+
+    def save(self, path):
+        """
+        Writes the recorded items to an SVG file.
+        """
+        with open(path, "w") as file:
+            file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}">\n')
+            file.write(f'<rect width="100%" height="100%" fill="{self.bg}"/>\n')
+            file.write("\n".join(item for item in self.items if item))
+            file.write("\n</svg>\n")
+
+
+#Task E
+class MultiCSVProcessor:
+    def __init__(self, streaming=False, chunk_size=TrafficTable.CHUNK_SIZE, bin_seconds=3600, cache=None,
+                 catalog=None, use_rollups=False, background=False, columnar_store=None, quarantine_dir=None,
+                 database=None, registry=None):
+        """
+        Initializes the application for processing multiple CSV files.
+        This class handles loading multiple CSV files, processing the data, 
+        and creating the corresponding histograms for each file.
+
+        Args:
+            streaming (bool): Aggregate each file chunk by chunk instead of loading all its rows.
+            chunk_size (int): The number of rows read at a time in streaming mode.
+            bin_seconds (int): The width of each histogram bin in seconds.
+            cache (DayCache): Binary cache of parsed days, or None to always parse the CSV.
+            catalog (DataCatalog): The available survey files, or None to list the current directory when needed.
+            use_rollups (bool): Draw hourly histograms from the files' rollup cubes instead of their rows.
+            background (bool): Open the window at once and load files that are not cached on a worker thread.
+            columnar_store (ColumnarStore): Exported Parquet/Arrow files to draw histograms from, or None.
+            quarantine_dir (str): Validate rows while loading and write bad ones here, or None to not validate.
+            database (SurveyDatabase): SQLite store to draw histograms from when it holds the date, or None.
+            registry (JunctionRegistry): Colours and positions of the junctions, kept for the whole session.
+        """
+        self.current_data = None  # Store the data loaded from the CSV file
+        self.current_counts = None  # Store the counts aggregated in streaming mode
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.bin_seconds = bin_seconds
+        self.cache = cache
+        self.catalog = catalog
+        self.use_rollups = use_rollups
+        self.background = background
+        self.columnar_store = columnar_store
+        self.quarantine_dir = quarantine_dir
+        self.database = database
+        self.registry = registry if registry is not None else JunctionRegistry()
+
+    def load_csv_file(self, file_path):
+        """
+        Loads a CSV file and processes its data.
+        This method reads the CSV file, parses it into a columnar TrafficTable, 
+        and stores it for further processing.
+        
+        Args:
+            file_path (str): The path to the CSV file to be loaded.
+        
+        Returns:
+            bool: True if the file is loaded successfully, False if not.
+        """
+        try:
+            with INSTRUMENTATION.stage("load", file=file_path) as record:
+                self.current_data = None  # Forget the previous day, so a cache miss always parses this file
+                if self.cache is not None:
+                    self.current_data = self.cache.load(file_path)  # Reuse the parsed day if it is cached
+                    record["cached"] = self.current_data is not None
+                if self.current_data is None:
+                    validator = SurveyValidator.for_file(file_path, self.quarantine_dir) if self.quarantine_dir else None
+                    self.current_data = TrafficTable.from_path(file_path, validator=validator)  # Store the rows as typed columns
+                    if validator is not None and validator.quarantined:
+                        record["quarantined"] = validator.quarantined
+                        print(f"Left out {validator.quarantined} bad rows of {file_path}, "
+                              f"see {validator.quarantine_path}: {validator.summary()['reasons']}")
+                    if self.cache is not None:
+                        self.cache.store(file_path, self.current_data)  # Cache the parsed day for the next view
+                record["rows"] = len(self.current_data)
+            return True  # Return True if the file is loaded successfully
+        except FileNotFoundError:
+            print(f"File {file_path} not found.")  # Print an error message if the file is not found
+            return False  # Return False if the file is not found
+        except ValueError as error:
+            print(f"Could not load {file_path}: {error}")  # A missing column or a row that could not be parsed
+            return False
+
+    def stream_csv_file(self, file_path):
+        """
+        Aggregates a CSV file chunk by chunk without keeping its rows.
+        Each chunk is folded into running counts per bin and junction and then
+        discarded, so memory use does not grow with the size of the file.
+
+        Args:
+            file_path (str): The path to the CSV file to be aggregated.
+
+        Returns:
+            bool: True if the file is aggregated successfully, False if not.
+        """
+        try:
+            with INSTRUMENTATION.stage("load", file=file_path, streaming=True) as record, open_survey(file_path, "r") as file:
+                validator = SurveyValidator.for_file(file_path, self.quarantine_dir) if self.quarantine_dir else None
+                counts = TrafficCounts(self.bin_seconds)
+                for chunk in TrafficTable.iter_chunks(file, self.chunk_size, validator):
+                    counts.fold_table(chunk)  # Add the chunk to the running counts
+                record["rows"] = counts.total()
+                if validator is not None and validator.quarantined:
+                    record["quarantined"] = validator.quarantined
+                    print(f"Left out {validator.quarantined} bad rows of {file_path}, "
+                          f"see {validator.quarantine_path}: {validator.summary()['reasons']}")
+            self.current_counts = counts
+            return True  # Return True if the file is aggregated successfully
+        except FileNotFoundError:
+            print(f"File {file_path} not found.")  # Print an error message if the file is not found
+            return False  # Return False if the file is not found
+        except (ValueError, KeyError) as error:
+            print(f"Could not load {file_path}: {error}")  # A missing column or a row that could not be parsed
+            return False
+
+    @staticmethod
+    def load_csv_rows(file_path):
+        """
+        Loads a CSV file as a list of dictionaries, one per row.
+        This is the original row-based loader, kept to compare against the columnar one.
+
+        Args:
+            file_path (str): The path to the CSV file to be loaded.
+
+        Returns:
+            list: The rows of the file as dictionaries of strings.
+        """
+        with open_survey(file_path, "r") as file:
+            return [row for row in csv.DictReader(file)]
+
+    def clear_previous_data(self):
+        """
+        Clears data from the previous run to process a new dataset.
+        This ensures that the application starts fresh with each new file.
+        """
+        self.current_data = None  # Clear the previous data
+        self.current_counts = None  # Clear the previous counts
+
+    def get_user_input(self):
+        """
+        Prompts the user for the date input in DDMMYYYY format and validates it.
+        The dates that have a survey file are listed first, and a date is only
+        accepted if it is valid and its file exists, so the user never has to
+        re-enter a date after a missing file.
+        
+        Returns:
+            str: The valid date entered by the user.
+        """
+        print(f"Survey dates available: {self.catalog.describe()}")
+        while True:
+            date_str = input("Please enter the date of the survey in the format DDMMYYYY: ").strip().replace("/", "")
+            try:
+                file_path = self.catalog.resolve(date_str)
+            except ValueError:
+                print("Invalid date - please enter a real date in the format DDMMYYYY.")
+                continue
+            if file_path is None:
+                print(f"There is no survey file for {date_str[:2]}/{date_str[2:4]}/{date_str[4:]}.")
+                continue
+            return date_str
+
+    def ask_to_continue(self):
+        """
+        Asks the user if they want to process another file or exit.
+        This allows the user to choose whether to continue or stop the program.
+        
+        Returns:
+            str: 'y' if the user wants to continue, 'n' if they want to exit.
+        """
+        while True:
+            continue_choice = input("Do you want to select a data file for a different date, Enter 'Y' or 'N': ").strip().lower()
+            # Check if the user input is valid
+            if continue_choice in ["y", "n"]:
+                return continue_choice  # Return the user's choice
+            else:
+                print("Invalid input. Please enter 'Y' or 'N'.")  # Print error if invalid
+
+    def handle_user_interaction(self):
+        """
+        Handles user input for processing multiple files.
+        This method interacts with the user to load CSV files, display histograms, 
+        and ask if they want to continue or exit.
+        """
+        if self.catalog is None:
+            self.catalog = DataCatalog()  # List the data directory once for the whole session
+        if not self.catalog:
+            print("No survey files were found.")
+            return
+        while True:
+            date_input = self.get_user_input()  # Get the date input from the user
+            self.show_date(date_input)
+
+            continue_choice = self.ask_to_continue()  # Ask if the user wants to continue
+            if continue_choice == "n":
+                print("Exiting program.")  # Exit the program if the user chooses 'n'
+                break  # Break the loop to exit
+            else:
+                self.clear_previous_data()  # Clear the data if the user wants to continue
+
+    def show_date(self, date_input, file_path=None):
+        """
+        Loads the survey file of a date and displays its histogram.
+
+        Args:
+            date_input (str): The date in DDMMYYYY format.
+            file_path (str): The survey file to load, or None to look the date up in the catalog.
+
+        Returns:
+            bool: True if the histogram was shown, False if the file could not be loaded.
+        """
+        if file_path is None:
+            file_path = self.catalog.resolve(date_input) or f"traffic_data{date_input}.csv"  # Find the file of the date
+
+        try:
+            day = datetime.strptime(date_input, "%d%m%Y").date()
+        except ValueError:
+            day = None  # A file not named after its date
+
+        # Try to load the CSV file and create the histogram if successful
+        if self.columnar_store is not None and day is not None and self.columnar_store.has(day):
+            self.current_counts = self.columnar_store.day_counts(day, self.bin_seconds)  # Read two columns of one day
+            histogram_app = HistogramApp(None, date_input, self.bin_seconds, self.current_counts, registry=self.registry)
+        elif self.database is not None and day is not None and self.database.has(day):
+            self.current_counts = self.database.day_counts(day, self.bin_seconds)  # Indexed aggregate query
+            histogram_app = HistogramApp(None, date_input, self.bin_seconds, self.current_counts, registry=self.registry)
+        elif self.use_rollups and self.bin_seconds == 3600 and os.path.exists(file_path):
+            self.current_counts = RollupCube.for_file(file_path).hourly_counts()  # Slice the pre-aggregated cube
+            histogram_app = HistogramApp(None, date_input, self.bin_seconds, self.current_counts, registry=self.registry)
+        elif self.background and not os.path.exists(file_path):
+            print(f"File {file_path} not found.")  # Print an error message if the file is not found
+            return False
+        elif self.background and (self.cache is None or self.cache.load(file_path) is None):
+            histogram_app = HistogramApp(None, date_input, self.bin_seconds, load_path=file_path,
+                                         quarantine_dir=self.quarantine_dir, registry=self.registry, cache=self.cache)
+        elif self.streaming:
+            if not self.stream_csv_file(file_path):
+                return False
+            histogram_app = HistogramApp(None, date_input, self.bin_seconds, self.current_counts, registry=self.registry)
+        elif self.load_csv_file(file_path):
+            histogram_app = HistogramApp(self.current_data, date_input, self.bin_seconds, registry=self.registry)
+        else:
+            return False
+        histogram_app.run()  # Run the histogram app to display the data
+        return True
+
+    def process_files(self):
+        """
+        Main loop for handling multiple CSV files until the user decides to quit.
+        This method continuously processes files based on user input until the user exits.
+        """
+        self.handle_user_interaction()  # Start the user interaction loop
+
+
+#Data Catalog
+DATA_FILE_PATTERN = re.compile(r"traffic_data(\d{8})\.csv(\.gz|\.xz|\.zst)?$")  # traffic_dataDDMMYYYY.csv, maybe compressed
+
+
+class DataCatalog:
+    """
+    The survey files available in a data directory, keyed by date.
+    The directory is listed once with os.scandir when the catalog is built,
+    after which a date resolves to its file with a single dictionary lookup.
+    The directory's modification time is kept, so a catalog can tell with one
+    stat call whether files were added or removed since.
+    """
+    def __init__(self, directory="."):
+        """
+        Builds the catalog of a directory.
+
+        Args:
+            directory (str): The directory holding the survey files.
+        """
+        self.directory = directory
+        self.files = {}  # Date -> path of the survey file for that day
+        self.mtime_ns = self.directory_mtime(directory)  # Modification time of the directory when listed
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            entries = []  # A missing directory has no survey files
+        for entry in entries:
+            match = DATA_FILE_PATTERN.match(entry.name)
+            if match:
+                try:
+                    day = datetime.strptime(match.group(1), "%d%m%Y").date()
+                except ValueError:
+                    continue  # Skip files named after impossible dates
+                if match.group(2) and day in self.files:
+                    continue  # Prefer the plain file, which can be memory-mapped
+                self.files[day] = entry.path
+
+    def __len__(self):
+        return len(self.files)
+
+    @staticmethod
+    def directory_mtime(directory):
+        try:
+            return os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refreshed(self):
+        """
+        Returns this catalog if the directory is unchanged, or a new catalog of it if files were added or removed.
+        """
+        if self.directory_mtime(self.directory) == self.mtime_ns:
+            return self
+        return DataCatalog(self.directory)
+
+    def dates(self):
+        """
+        Returns the dates that have a survey file, in order.
+        """
+        return sorted(self.files)
+
+    def resolve(self, date_input):
+        """
+        Returns the file of a date given in DDMMYYYY format, or None if there is no file for it.
+        Raises ValueError if the text is not a valid date.
+        """
+        return self.files.get(datetime.strptime(date_input, "%d%m%Y").date())
+
+    def files_in_range(self, start, end):
+        """
+        Returns the survey files whose dates fall between start and end.
+
+        Args:
+            start (str): The first date in DDMMYYYY format.
+            end (str): The last date in DDMMYYYY format.
+        """
+        first = datetime.strptime(start, "%d%m%Y").date()
+        last = datetime.strptime(end, "%d%m%Y").date()
+        return [path for day, path in sorted(self.files.items()) if first <= day <= last]
+
+    def describe(self):
+        """
+        Returns the available dates as DD/MM/YYYY text for prompts and messages.
+        """
+        return ", ".join(day.strftime("%d/%m/%Y") for day in self.dates()) or "none"
+
+
+#Dataset Index
+class TrafficDatasetIndex:
+    """
+    Index of the traffic_dataDDMMYYYY.csv files in a directory.
+    For each file it records the date, row count, byte offset at which each
+    hour starts, vehicle count per junction and a summary of counts per
+    15 minutes and junction. Date-range queries are answered from these
+    summaries without reading the raw CSV files again. The index is saved as
+    JSON and only files whose modification time or size changed are rescanned.
+    """
+    SUMMARY_BIN_SECONDS = 900  # Summaries are kept at 15 minute resolution
+    BINS = {"15min": 900, "hour": 3600, "day": None, "week": None, "month": None}
+
+    def __init__(self, directory=".", index_file="traffic_index.json"):
+        """
+        Initializes the index for a directory and loads the saved index if there is one.
+
+        Args:
+            directory (str): The directory holding the survey files.
+            index_file (str): The file name of the saved index inside the directory.
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, index_file)
+        self.days = {}  # ISO date -> index entry of the file for that day
+        try:
+            with open(self.index_path, "r") as file:
+                self.days = json.load(file)["days"]
+        except (FileNotFoundError, ValueError, KeyError):
+            self.days = {}  # Start from an empty index if there is no valid saved one
+
+    def refresh(self):
+        """
+        Scans the directory once, indexes new or changed files, drops deleted ones and saves the index.
+
+        Returns:
+            int: The number of files that were (re)indexed.
+        """
+        known = {entry["file"]: (day, entry) for day, entry in self.days.items()}
+        days = {}
+        indexed = 0
+        for day, file_path in DataCatalog(self.directory).files.items():
+            day = day.isoformat()
+            stat = os.stat(file_path)
+            previous = known.get(os.path.basename(file_path))
+            if previous and previous[1]["mtime_ns"] == stat.st_mtime_ns and previous[1]["size"] == stat.st_size:
+                days[day] = previous[1]  # Unchanged since it was last indexed
+                continue
+            days[day] = self.index_file(file_path, stat)
+            indexed += 1
+        changed = indexed or days.keys() != self.days.keys()
+        self.days = days
+        if changed:
+            self.save()
+        return indexed
+
+    def index_file(self, file_path, stat):
+        """
+        Reads one survey file and returns its index entry.
+        Rows are checked by a SurveyValidator in chunks; bad rows are left out and counted.
+        """
+        n_bins = 86400 // self.SUMMARY_BIN_SECONDS
+        summary = {}  # Junction name -> list of counts per 15 minutes
+        hour_offsets = [None] * 25  # Byte offset of the first row of each hour, then the end of the file
+        ordered = True  # Whether the rows are grouped by hour, making the offsets usable
+        rows = 0
+        last_hour = 0
+        validator = SurveyValidator.for_file(file_path, None)  # Counts the bad rows without writing them out
+
+        def add(offsets, chunk):
+            nonlocal ordered, rows, last_hour
+            for i in validator.good_indices(header, chunk):
+                fields = chunk[i]
+                seconds = parse_time_of_day(fields[time_index])
+                hour = seconds // 3600
+                if hour_offsets[hour] is None:
+                    hour_offsets[hour] = offsets[i]
+                if hour < last_hour:
+                    ordered = False
+                last_hour = hour
+                counts = summary.get(fields[junction_index])
+                if counts is None:
+                    counts = summary[fields[junction_index]] = [0] * n_bins
+                counts[seconds // self.SUMMARY_BIN_SECONDS] += 1
+                rows += 1
+
+        with open_survey(file_path) as file:
+            header = next(csv.reader([file.readline().decode()]), [])
+            junction_index = header.index("JunctionName")
+            time_index = header.index("timeOfDay")
+            offset = file.tell()
+            offsets, chunk = [], []  # Byte offset and fields of the rows not checked yet
+            for line in file:
+                if line.strip():
+                    if b'"' in line:
+                        fields = next(csv.reader([line.decode()]))  # Quoted fields need the csv module
+                    else:
+                        fields = line.decode().rstrip("\r\n").split(",")
+                    offsets.append(offset)
+                    chunk.append(fields)
+                    if len(chunk) == TrafficTable.CHUNK_SIZE:
+                        add(offsets, chunk)
+                        offsets, chunk = [], []
+                offset += len(line)
+            add(offsets, chunk)
+        hour_offsets[24] = offset
+        for hour in range(23, -1, -1):
+            if hour_offsets[hour] is None:
+                hour_offsets[hour] = hour_offsets[hour + 1]  # An empty hour starts where the next one does
+        return {
+            "file": os.path.basename(file_path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "rows": rows,
+            "skipped": validator.quarantined,
+            "hour_offsets": hour_offsets if ordered and compression_of(file_path) is None else None,
+            "junction_counts": {junction: sum(counts) for junction, counts in summary.items()},
+            "summary": summary,
+        }
+
+    def save(self):
+        """
+        Writes the index to its JSON file.
+        """
+        with open(self.index_path + ".tmp", "w") as file:
+            json.dump({"summary_bin_seconds": self.SUMMARY_BIN_SECONDS, "days": self.days}, file)
+        os.replace(self.index_path + ".tmp", self.index_path)
+
+    def dates(self):
+        """
+        Returns the dates that have a survey file, in order.
+        """
+        return [date.fromisoformat(day) for day in sorted(self.days)]
+
+    def junctions(self):
+        """
+        Returns every junction found in the indexed files, sorted alphabetically.
+        """
+        return sorted({junction for entry in self.days.values() for junction in entry["junction_counts"]})
+
+    def day_counts(self, day, bin_seconds=3600):
+        """
+        Returns the TrafficCounts of one indexed day at the given bin width.
+
+        Args:
+            day (date): The date of the survey.
+            bin_seconds (int): The width of each bin; a multiple of 15 minutes.
+        """
+        if bin_seconds % self.SUMMARY_BIN_SECONDS:
+            raise ValueError(f"Bin width must be a multiple of {self.SUMMARY_BIN_SECONDS} seconds.")
+        entry = self.days[day.isoformat()]
+        counts = TrafficCounts(bin_seconds)
+        per_bin = bin_seconds // self.SUMMARY_BIN_SECONDS  # Summary bins merged into each bin
+        for junction, summary in entry["summary"].items():
+            column = counts.column(junction)
+            for index, count in enumerate(summary):
+                column[index // per_bin] += count
+        return counts
+
+    def counts(self, junctions=None, start_date=None, end_date=None, bin="day"):
+        """
+        Returns vehicle counts per period and junction over a range of dates.
+
+        Args:
+            junctions (list): The junctions to include, or None for all of them.
+            start_date (date): The first date of the range, or None for the earliest file.
+            end_date (date): The last date of the range, or None for the latest file.
+            bin (str): The period of each count: "15min", "hour", "day", "week" or "month".
+
+        Returns:
+            dict: Period label -> {junction: count}, with periods in order.
+        """
+        if bin not in self.BINS:
+            raise ValueError(f"Unknown bin {bin!r}; expected one of {', '.join(self.BINS)}.")
+        wanted = set(junctions) if junctions is not None else None
+        result = {}
+        for day in self.dates():
+            if (start_date and day < start_date) or (end_date and day > end_date):
+                continue
+            summary = self.days[day.isoformat()]["summary"]
+            for junction, counts in summary.items():
+                if wanted is not None and junction not in wanted:
+                    continue
+                if self.BINS[bin]:
+                    per_bin = self.BINS[bin] // self.SUMMARY_BIN_SECONDS
+                    for index in range(0, len(counts), per_bin):
+                        minutes = index * self.SUMMARY_BIN_SECONDS // 60
+                        period = f"{day.isoformat()} {minutes // 60:02d}:{minutes % 60:02d}"
+                        totals = result.setdefault(period, {})
+                        totals[junction] = totals.get(junction, 0) + sum(counts[index:index + per_bin])
+                    continue
+                if bin == "day":
+                    period = day.isoformat()
+                elif bin == "week":
+                    year, week, _ = day.isocalendar()
+                    period = f"{year}-W{week:02d}"
+                else:
+                    period = f"{day.year}-{day.month:02d}"
+                totals = result.setdefault(period, {})
+                totals[junction] = totals.get(junction, 0) + sum(counts)
+        return dict(sorted(result.items()))
+
+
+#Rollup Cubes
+class RollupCube:
+    """
+    Pre-aggregated vehicle counts of one survey file over the dimensions
+    junction x hour x direction in x direction out x vehicle type x weather.
+    Only non-empty cells are stored: each cell key packs one byte-sized code
+    per dimension into an integer. The cube is saved next to its CSV file and
+    remembers how many bytes of the CSV it has counted, so when the day's file
+    grows only the appended rows are read. A hash of the bytes just before that
+    offset tells an append apart from a rewrite, which is counted from scratch.
+    """
+    DIMENSIONS = ("junction", "hour", "direction_in", "direction_out", "vehicle_type", "weather")
+    COLUMNS = ("JunctionName", None, "travel_Direction_in", "travel_Direction_out", "VehicleType", "Weather_Conditions")
+    MAGIC = b"TRC1"
+    HEADER = struct.Struct("<4sI")  # Magic and the length of the JSON header
+    SUFFIX = ".cube"
+    FINGERPRINT_BYTES = 4096  # Bytes before the counted offset that are hashed
+
+    def __init__(self):
+        self.labels = {dimension: [] for dimension in self.DIMENSIONS}  # Dimension -> label of each code
+        self.labels["hour"] = list(range(24))  # Hours are their own codes
+        self.cells = Counter()  # Packed cell key -> number of vehicles
+        self.offset = 0  # Bytes of the CSV file counted so far
+        self.header = None  # Column names of the CSV file
+        self.mtime_ns = self.size = None  # Modification time and size of the CSV when last counted
+        self.fingerprint = None  # Hash of the bytes just before offset when last counted
+        self.skipped = 0  # Bad rows left out of the counts
+
+    @classmethod
+    def for_file(cls, file_path):
+        """
+        Returns the cube of a survey file, loading it from disk and counting any rows
+        appended since it was saved, or building it on first use.
+        """
+        cube = cls.load(file_path + cls.SUFFIX) or cls()
+        cube.update(file_path)
+        return cube
+
+    @classmethod
+    def load(cls, cube_path):
+        """
+        Reads a saved cube, or returns None if there is no valid one.
+        """
+        try:
+            with open(cube_path, "rb") as file:
+                magic, header_length = cls.HEADER.unpack(file.read(cls.HEADER.size))
+                if magic != cls.MAGIC:
+                    return None
+                header = json.loads(file.read(header_length))
+                keys, counts = array("Q"), array("Q")
+                keys.frombytes(file.read(header["cells"] * keys.itemsize))
+                counts.frombytes(file.read(header["cells"] * counts.itemsize))
+        except (FileNotFoundError, struct.error, ValueError, KeyError):
+            return None
+        cube = cls()
+        cube.labels = header["labels"]
+        cube.cells = Counter(dict(zip(keys, counts)))
+        cube.offset, cube.header = header["offset"], header["header"]
+        cube.mtime_ns, cube.size = header["mtime_ns"], header["size"]
+        cube.fingerprint = header.get("fingerprint")
+        cube.skipped = header.get("skipped", 0)
+        return cube
+
+    def save(self, cube_path):
+        """
+        Writes the cube to disk, replacing any earlier version in one step.
+        """
+        header = json.dumps({
+            "labels": self.labels, "offset": self.offset, "header": self.header,
+            "mtime_ns": self.mtime_ns, "size": self.size, "fingerprint": self.fingerprint, "skipped": self.skipped,
+            "cells": len(self.cells),
+        }).encode()
+        with open(cube_path + ".tmp", "wb") as file:
+            file.write(self.HEADER.pack(self.MAGIC, len(header)))
+            file.write(header)
+            file.write(array("Q", self.cells.keys()).tobytes())
+            file.write(array("Q", self.cells.values()).tobytes())
+        os.replace(cube_path + ".tmp", cube_path)
+
+    def update(self, file_path):
+        """
+        Counts the rows added to a survey file since the cube was last updated and saves the cube.
+
+        Returns:
+            bool: True if the cube changed.
+        """
+        stat = os.stat(file_path)
+        if (stat.st_mtime_ns, stat.st_size) == (self.mtime_ns, self.size):
+            return False  # Nothing was appended
+        if compression_of(file_path) is not None:
+            self.__init__()  # Archives are not appended to, so count the whole file
+            validator = SurveyValidator.for_file(file_path, None)  # Bad rows are counted, not raised
+            self.fold_table(TrafficTable.from_path(file_path, validator=validator))
+            self.skipped = validator.quarantined
+            self.mtime_ns, self.size = stat.st_mtime_ns, stat.st_size
+            self.save(file_path + self.SUFFIX)
+            return True
+        if self.offset and (stat.st_size < self.offset or
+                            self.fingerprint != self.fingerprint_of(file_path, self.offset)):
+            self.__init__()  # The file was rewritten, so count it from the start
+        tail = CSVTail(file_path)
+        tail.offset, tail.header = self.offset, self.header
+        table, restarted = tail.read_new()
+        if restarted:
+            self.__init__()
+        self.fold_table(table)
+        self.skipped += tail.skipped
+        self.offset, self.header = tail.offset, tail.header
+        self.fingerprint = self.fingerprint_of(file_path, self.offset)
+        self.mtime_ns, self.size = stat.st_mtime_ns, stat.st_size
+        self.save(file_path + self.SUFFIX)
+        return True
+
+    @classmethod
+    def fingerprint_of(cls, file_path, offset):
+        """
+        Returns a hash of the bytes of a file just before an offset.
+        """
+        with open(file_path, "rb") as file:
+            file.seek(max(offset - cls.FINGERPRINT_BYTES, 0))
+            return hashlib.sha1(file.read(min(offset, cls.FINGERPRINT_BYTES))).hexdigest()
+
+    def fold_table(self, table):
+        """
+        Adds the vehicles of a traffic table to the cube.
+        The table's codes are packed into one key per row and counted with C-level
+        iterators; only the distinct keys are then translated into cube codes.
+        """
+        columns = [map(floordiv, table.columns["timeOfDay"], repeat(3600)) if name is None else table.columns[name]
+                   for name in self.COLUMNS]
+        keys = columns[0]
+        for column in columns[1:]:
+            keys = map(or_, map(lshift, keys, repeat(8)), column)  # Append the next dimension's byte
+        mappings = [range(24) if name is None else [self.code(dimension, label) for label in table.labels[name]]
+                    for dimension, name in zip(self.DIMENSIONS, self.COLUMNS)]
+        for key, count in Counter(keys).items():
+            cube_key = 0
+            for shift, mapping in zip(range(40, -8, -8), mappings):
+                cube_key = (cube_key << 8) | mapping[(key >> shift) & 255]
+            self.cells[cube_key] += count
+
+    def code(self, dimension, label):
+        """
+        Returns the cube code of a label, giving new labels the next free code.
+        """
+        labels = self.labels[dimension]
+        try:
+            return labels.index(label)
+        except ValueError:
+            if len(labels) == 256:
+                raise ValueError(f"Too many distinct values for {dimension}.")
+            labels.append(label)
+            return len(labels) - 1
+
+    def query(self, group_by=("hour",), **filters):
+        """
+        Sums the cube's cells, grouped by some dimensions and filtered on others.
+
+        Args:
+            group_by (tuple): The dimensions to keep, e.g. ("junction", "hour").
+            filters: Dimension name -> labels to include, e.g. weather=["Clear"].
+
+        Returns:
+            dict: Tuple of group labels -> number of vehicles.
+        """
+        shifts = {dimension: 40 - 8 * i for i, dimension in enumerate(self.DIMENSIONS)}
+        keys, counts = list(self.cells.keys()), list(self.cells.values())
+        for dimension, wanted in filters.items():
+            allowed = {code for code, label in enumerate(self.labels[dimension]) if label in set(wanted)}
+            codes = map(and_, map(rshift, keys, repeat(shifts[dimension])), repeat(255))
+            keep = list(map(allowed.__contains__, codes))
+            keys, counts = list(compress(keys, keep)), list(compress(counts, keep))
+        mask = sum(255 << shifts[dimension] for dimension in group_by)
+        totals = {}
+        for key, count in zip(map(and_, keys, repeat(mask)), counts):
+            totals[key] = totals.get(key, 0) + count
+        return {tuple(self.labels[dimension][(key >> shifts[dimension]) & 255] for dimension in group_by): count
+                for key, count in totals.items()}
+
+    def hourly_counts(self):
+        """
+        Returns the hourly counts per junction as TrafficCounts, for the histogram.
+        """
+        counts = TrafficCounts(3600)
+        for junction in self.labels["junction"]:
+            counts.column(junction)
+        for (junction, hour), count in self.query(("junction", "hour")).items():
+            counts.column(junction)[hour] += count
+        return counts
+
+
+class RollupStore:
+    """
+    The rollup cubes of every survey file in a data directory.
+    Questions over a range of days are answered by querying each day's cube
+    and adding up the results, without reading the raw rows.
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def query(self, start=None, end=None, group_by=("hour",), **filters):
+        """
+        Sums the cubes of the days between start and end (dates, inclusive).
+        Cubes are built or brought up to date on first use.
+
+        Returns:
+            dict: Tuple of group labels -> number of vehicles.
+        """
+        totals = Counter()
+        for day, file_path in sorted(self.catalog.files.items()):
+            if (start is None or day >= start) and (end is None or day <= end):
+                totals.update(RollupCube.for_file(file_path).query(group_by, **filters))
+        return dict(sorted(totals.items(), key=lambda item: [str(label) for label in item[0]]))
+
+
+#Columnar Export
+class ColumnarStore:
+    """
+    Survey days exported to Parquet or Arrow IPC files for downstream tools.
+    The files are partitioned by date and junction (Date=YYYY-MM-DD/JunctionName=...)
+    and keep proper types: text columns stay dictionary-encoded, 'timeOfDay'
+    is a time of day, speeds are small unsigned integers and 'elctricHybrid'
+    is a boolean. Reads project only the columns asked for and filter on the
+    partition keys, so an hourly histogram opens only the files of one day
+    and reads only 'timeOfDay' from them. Needs pyarrow, which is optional.
+    """
+    FORMATS = {"parquet": "parquet", "ipc": "arrow"}  # Dataset format -> file extension
+
+    def __init__(self, root="traffic_parquet", format="parquet"):
+        """
+        Args:
+            root (str): The directory holding the partitioned files.
+            format (str): "parquet" or "ipc" (Arrow IPC / Feather v2).
+        """
+        self.root = root
+        self.format = format
+
+    @staticmethod
+    def arrow():
+        """
+        Imports pyarrow and its dataset module, which are only needed by this class.
+        """
+        import pyarrow
+        import pyarrow.dataset
+        return pyarrow, pyarrow.dataset
+
+    def partitioning(self):
+        pa, ds = self.arrow()
+        return ds.partitioning(pa.schema([("Date", pa.date32()), ("JunctionName", pa.string())]), flavor="hive")
+
+    def to_arrow(self, table):
+        """
+        Converts a TrafficTable to a pyarrow Table, reusing its column buffers where the types allow.
+        """
+        pa, _ = self.arrow()
+        rows = len(table)
+
+        def column(name, arrow_type):
+            return pa.Array.from_buffers(arrow_type, rows, [None, pa.py_buffer(table.columns[name])])
+
+        data = {}
+        for name in TrafficTable.CODED_COLUMNS:
+            labels = table.labels[name]
+            if name == "Date":
+                labels = [datetime.strptime(label, "%d/%m/%Y").date() for label in labels]
+            data[name] = pa.DictionaryArray.from_arrays(column(name, pa.uint8()), pa.array(labels))
+        for name in ("Date", "JunctionName"):
+            data[name] = data[name].dictionary_decode()  # Partition keys are plain values
+        data["timeOfDay"] = column("timeOfDay", pa.int32()).view(pa.time32("s"))
+        data["VehicleSpeed"] = column("VehicleSpeed", pa.uint8())
+        data["JunctionSpeedLimit"] = column("JunctionSpeedLimit", pa.uint16())
+        data["elctricHybrid"] = pa.Array.from_buffers(pa.bool_(), rows, [None, pa.py_buffer(table.electric_hybrid)])
+        return pa.table(data)
+
+    def export(self, file_path):
+        """
+        Writes a survey file to the store, replacing the partitions it wrote before.
+
+        Returns:
+            int: The number of rows written.
+        """
+        _, ds = self.arrow()
+        table = TrafficTable.from_path(file_path)
+        name = survey_name(file_path)
+        ds.write_dataset(self.to_arrow(table), self.root, format=self.format, partitioning=self.partitioning(),
+                         basename_template=f"{name}-{{i}}.{self.FORMATS[self.format]}",
+                         existing_data_behavior="delete_matching")
+        return len(table)
+
+    def has(self, day):
+        """
+        Returns True if the store holds the given date.
+        """
+        return os.path.isdir(os.path.join(self.root, f"Date={day.isoformat()}"))
+
+    def nbytes(self, day=None):
+        """
+        Returns the size of the store's files, or of one date's files.
+        """
+        top = os.path.join(self.root, f"Date={day.isoformat()}") if day else self.root
+        return sum(os.path.getsize(os.path.join(directory, name))
+                   for directory, _, names in os.walk(top) for name in names)
+
+    def read(self, day, columns=None, junctions=None):
+        """
+        Reads the rows of a date as a pyarrow Table.
+
+        Args:
+            day (date): The survey date.
+            columns (list): The columns to read, or None for all of them.
+            junctions (list): The junctions to read, or None for all of them.
+        """
+        _, ds = self.arrow()
+        dataset = ds.dataset(self.root, format=self.format, partitioning=self.partitioning())
+        condition = ds.field("Date") == day
+        if junctions:
+            condition &= ds.field("JunctionName").isin(junctions)
+        return dataset.to_table(columns=columns, filter=condition)
+
+    def day_counts(self, day, bin_seconds=3600, junctions=None):
+        """
+        Returns the vehicle counts of a date per bin and junction, reading only the two columns needed.
+        """
+        pa, _ = self.arrow()
+        import pyarrow.compute as pc
+        table = self.read(day, ["JunctionName", "timeOfDay"], junctions)
+        seconds = table["timeOfDay"].cast(pa.time32("s")).cast(pa.int32())  # Parquet stores times in milliseconds
+        bins = pc.divide(seconds, bin_seconds)
+        grouped = pa.table({"junction": table["JunctionName"], "bin": bins}).group_by(["junction", "bin"]).aggregate(
+            [("bin", "count")])
+        counts = TrafficCounts(bin_seconds)
+        for junction, bin_index, count in zip(*(grouped[name].to_pylist() for name in ("junction", "bin", "bin_count"))):
+            counts.column(junction)[bin_index] = count
+        return counts
+
+
+#SQLite Store
+class SurveyDatabase:
+    """
+    Survey rows bulk-loaded into a local SQLite database, so questions across
+    many days and junctions are answered by indexed aggregate queries instead
+    of re-reading the CSV files. Text values are stored once in a labels
+    table and referenced by id. The (date, junction, hour) index covers the
+    hourly histogram query, which therefore never touches the rows
+    themselves. Files are loaded with executemany, one transaction per file,
+    and re-loaded only when their modification time or size changes.
+    """
+    LABEL_COLUMNS = {"JunctionName": "junction", "travel_Direction_in": "direction_in",
+                     "travel_Direction_out": "direction_out", "Weather_Conditions": "weather",
+                     "VehicleType": "vehicle_type"}  # Encoded CSV column -> database column
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS labels (id INTEGER PRIMARY KEY, kind TEXT NOT NULL, label TEXT NOT NULL,
+                                           UNIQUE (kind, label));
+        CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime_ns INTEGER,
+                                          size INTEGER, rows INTEGER);
+        CREATE TABLE IF NOT EXISTS vehicles (file_id INTEGER NOT NULL, date TEXT NOT NULL, junction INTEGER NOT NULL,
+                                             hour INTEGER NOT NULL, seconds INTEGER NOT NULL,
+                                             direction_in INTEGER, direction_out INTEGER, weather INTEGER,
+                                             vehicle_type INTEGER, speed INTEGER, speed_limit INTEGER,
+                                             electric_hybrid INTEGER);
+        CREATE INDEX IF NOT EXISTS vehicles_file ON vehicles (file_id);
+    """
+    INDEX = "CREATE INDEX IF NOT EXISTS vehicles_date_junction_hour ON vehicles (date, junction, hour)"
+    INSERT = "INSERT INTO vehicles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+    def __init__(self, path="traffic.sqlite"):
+        """
+        Opens (creating if needed) the database file.
+        """
+        import sqlite3  # Only the database modes need it
+
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")  # Readers are not blocked while a file loads
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, and much faster to commit
+        self.connection.execute("PRAGMA temp_store=MEMORY")
+        self.connection.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+        self.connection.executescript(self.SCHEMA)
+        self.connection.execute(self.INDEX)
+        self.label_ids = {}  # (kind, label) -> id
+
+    def close(self):
+        self.connection.close()
+
+    def label_id(self, kind, label):
+        """
+        Returns the id of a text value, adding it to the labels table if it is new.
+        """
+        key = (kind, label)
+        label_id = self.label_ids.get(key)
+        if label_id is None:
+            self.connection.execute("INSERT OR IGNORE INTO labels (kind, label) VALUES (?, ?)", key)
+            label_id = self.label_ids[key] = self.connection.execute(
+                "SELECT id FROM labels WHERE kind = ? AND label = ?", key).fetchone()[0]
+        return label_id
+
+    def ingest(self, file_paths, validate=True, quarantine_dir="quarantine"):
+        """
+        Loads survey files into the database, skipping files that are unchanged since they were loaded.
+        When the database holds no rows yet, the index is built once after all
+        files are loaded, which is faster than keeping it up to date row by row.
+
+        Returns:
+            int: The number of rows inserted.
+        """
+        empty = self.connection.execute("SELECT NOT EXISTS (SELECT 1 FROM vehicles)").fetchone()[0]
+        if empty:
+            self.connection.execute("DROP INDEX IF EXISTS vehicles_date_junction_hour")
+        inserted = 0
+        for file_path in file_paths:
+            inserted += self.ingest_file(file_path, validate, quarantine_dir)
+        if empty:
+            with INSTRUMENTATION.stage("index"):
+                self.connection.execute(self.INDEX)
+                self.connection.execute("ANALYZE")
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # Move the loaded pages into the database file
+        return inserted
+
+    def ingest_file(self, file_path, validate=True, quarantine_dir="quarantine"):
+        """
+        Loads one survey file in a single transaction, replacing its rows if it was loaded before.
+
+        Returns:
+            int: The number of rows inserted, 0 if the file was unchanged.
         """
-        Initializes the histogram application with the traffic data and selected date.
-        - traffic_data: List of traffic records containing vehicle data.
-        - date: The date of the traffic survey.
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        previous = self.connection.execute("SELECT id, mtime_ns, size FROM files WHERE path = ?", (path,)).fetchone()
+        if previous and previous[1:] == (stat.st_mtime_ns, stat.st_size):
+            return 0
+        validator = SurveyValidator.for_file(file_path, quarantine_dir) if validate else None
+        with INSTRUMENTATION.stage("load", file=file_path) as record:
+            table = TrafficTable.from_path(file_path, validator=validator)
+            record["rows"] = len(table)
+        with INSTRUMENTATION.stage("insert", file=file_path, rows=len(table)), self.connection:
+            if previous:
+                self.connection.execute("DELETE FROM vehicles WHERE file_id = ?", (previous[0],))
+                self.connection.execute("DELETE FROM files WHERE id = ?", (previous[0],))
+            file_id = self.connection.execute("INSERT INTO files (path, mtime_ns, size, rows) VALUES (?, ?, ?, ?)",
+                                              (path, stat.st_mtime_ns, stat.st_size, len(table))).lastrowid
+            columns = table.columns
+            ids = {name: [self.label_id(kind, label) for label in table.labels[name]]
+                   for name, kind in self.LABEL_COLUMNS.items()}
+            dates = [datetime.strptime(label, "%d/%m/%Y").date().isoformat() for label in table.labels["Date"]]
+            rows = zip(
+                repeat(file_id),
+                map(dates.__getitem__, columns["Date"]),
+                map(ids["JunctionName"].__getitem__, columns["JunctionName"]),
+                map(floordiv, columns["timeOfDay"], repeat(3600)),
+                columns["timeOfDay"],
+                map(ids["travel_Direction_in"].__getitem__, columns["travel_Direction_in"]),
+                map(ids["travel_Direction_out"].__getitem__, columns["travel_Direction_out"]),
+                map(ids["Weather_Conditions"].__getitem__, columns["Weather_Conditions"]),
+                map(ids["VehicleType"].__getitem__, columns["VehicleType"]),
+                columns["VehicleSpeed"],
+                columns["JunctionSpeedLimit"],
+                table.hybrid_flags(),
+            )
+            self.connection.executemany(self.INSERT, rows)  # One prepared statement for every row
+        return len(table)
+
+    def dates(self):
         """
-        self.traffic_data = traffic_data  # Store the traffic data
-        self.date = date  # Store the selected date
-        self.root = tk.Tk()  # Create the main window for the application
-        self.canvas = None  # Will hold the canvas for drawing the histogram
+        Returns the dates that have rows, in order.
+        """
+        return [date.fromisoformat(day) for (day,) in self.connection.execute(
+            "SELECT DISTINCT date FROM vehicles ORDER BY date")]
 
-    def setup_window(self):
+    def has(self, day):
         """
-        Sets up the Tkinter window and canvas for drawing the histogram.
-        The window will display the title and contain a canvas to draw on.
+        Returns True if the database holds rows for the given date.
         """
-        self.root.title(f"Histogram of Vehicle Frequency per Hour ({self.date[:2]}/{self.date[2:4]}/{self.date[4:]})")  # Set the window title
-        # Create a canvas widget where the histogram will be drawn
-        self.canvas = Canvas(self.root, width=1000, height=600, bg="#E9F4E9")
-        self.canvas.pack()  # Add the canvas to the window
+        return self.connection.execute("SELECT EXISTS (SELECT 1 FROM vehicles WHERE date = ?)",
+                                       (day.isoformat(),)).fetchone()[0] == 1
 
-    def aggregate_data(self):
+    def day_counts(self, day, bin_seconds=3600, junctions=None):
         """
-        Aggregates the traffic data by hour and junction.
-        This function loops through the traffic data, extracts the hour from the 
-        'timeOfDay' field, and counts how many vehicles passed each junction in 
-        that hour. It returns a dictionary with hourly vehicle counts for each junction.
-        
-        Returns:
-            dict: A dictionary with hourly vehicle counts for each junction.
+        Returns the vehicle counts of a date per bin and junction.
+        Hourly counts are read from the (date, junction, hour) index alone.
         """
-        # Initialize a dictionary to store the counts of vehicles per hour for each junction
-        hourly_data = {hour: {"Elm Avenue/Rabbit Road": 0, "Hanley Highway/Westway": 0} for hour in range(24)}
+        bin_column = "hour" if bin_seconds == 3600 else f"seconds / {int(bin_seconds)}"
+        query = (f"SELECT labels.label, {bin_column}, COUNT(*) FROM vehicles JOIN labels ON labels.id = vehicles.junction "
+                 f"WHERE vehicles.date = ? GROUP BY vehicles.junction, {bin_column}")
+        counts = TrafficCounts(bin_seconds)
+        for junction, bin_index, count in self.connection.execute(query, (day.isoformat(),)):
+            if junctions is None or junction in junctions:
+                counts.column(junction)[bin_index] = count
+        return counts
 
-        # Loop through each record in the traffic data
-        for record in self.traffic_data:
-            time = record['timeOfDay']  # Get the time of day from the record (e.g., "14:30")
-            junction = record['JunctionName']  # Get the junction name from the record
-            hour = int(time.split(":")[0])  # Extract the hour from the time (e.g., 14:30 -> 14)
+    def summary(self, start=None, end=None, by="junction"):
+        """
+        Returns vehicle, speed and compliance figures over a range of dates, per junction or vehicle type.
+
+        Args:
+            start (date): The first date, or None for the earliest.
+            end (date): The last date, or None for the latest.
+            by (str): "junction" or "vehicle_type".
+        """
+        column = {"junction": "junction", "vehicle_type": "vehicle_type"}[by]
+        query = (f"SELECT labels.label, COUNT(*), AVG(speed), SUM(speed > speed_limit), AVG(electric_hybrid), "
+                 f"COUNT(DISTINCT date) FROM vehicles JOIN labels ON labels.id = vehicles.{column} "
+                 f"WHERE date BETWEEN ? AND ? GROUP BY vehicles.{column} ORDER BY labels.label")
+        bounds = ((start or date.min).isoformat(), (end or date.max).isoformat())
+        return {
+            label: {"vehicles": vehicles, "days": days, "mean_speed": mean_speed, "speeding": speeding,
+                    "speeding_share": speeding / vehicles, "electric_hybrid_share": hybrid_share}
+            for label, vehicles, mean_speed, speeding, hybrid_share, days in self.connection.execute(query, bounds)
+        }
 
-            # If the junction is in the hourly data, increment the count for that hour and junction
-            if junction in hourly_data[hour]:
-                hourly_data[hour][junction] += 1
+    def daily_totals(self, start=None, end=None):
+        """
+        Returns the number of vehicles per date and junction, from the index alone.
+        """
+        query = ("SELECT vehicles.date, labels.label, COUNT(*) FROM vehicles JOIN labels ON labels.id = vehicles.junction "
+                 "WHERE vehicles.date BETWEEN ? AND ? GROUP BY vehicles.date, vehicles.junction")
+        totals = {}
+        for day, junction, count in self.connection.execute(
+                query, ((start or date.min).isoformat(), (end or date.max).isoformat())):
+            totals.setdefault(day, {})[junction] = count
+        return totals
 
-        return hourly_data  # Return the aggregated data
 
+#Parallel Ingestion
+def _ingest_worker(shm_name, slot, file_path, bin_seconds, max_junctions, quarantine_dir=None):
+    """
+    Aggregates one survey file in a worker process and writes its count matrix
+    into the given slot of the shared memory block. Only the junction names
+    travel back to the parent; the counts never get pickled.
 
+    Returns:
+        tuple: The slot written and the junction name of each matrix column.
+    """
+    processor = MultiCSVProcessor(streaming=True, bin_seconds=bin_seconds, quarantine_dir=quarantine_dir)
+    if not processor.stream_csv_file(file_path):
+        raise ValueError(f"Could not load {file_path}.")
+    counts = processor.current_counts
+    junctions = counts.junctions
+    if len(junctions) > max_junctions:
+        raise ValueError(f"{file_path} has more than {max_junctions} junctions.")
+    from multiprocessing import shared_memory
 
-    def find_max_vehicles(self, hourly_data):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        with shm.buf.cast("L") as matrix:  # Days x bins x junctions, laid out like TrafficCounts columns
+            base = slot * counts.n_bins * max_junctions
+            for j, junction in enumerate(junctions):
+                matrix[base + j:base + counts.n_bins * max_junctions:max_junctions] = counts.columns[junction]
+    finally:
+        shm.close()
+    return slot, junctions
+
+
+def ingest_files(file_paths, bin_seconds=3600, workers=None, max_junctions=64, quarantine_dir=None):
+    """
+    Aggregates many survey files in parallel and merges them into multi-day totals.
+    Each worker writes its day's bins x junctions count matrix straight into a
+    shared memory array, which is read back here once all workers finish.
+
+    Args:
+        file_paths (list): The CSV files to be ingested.
+        bin_seconds (int): The width of each bin in seconds.
+        workers (int): The number of worker processes, or None for one per core.
+        max_junctions (int): The most junctions a single file may contain.
+        quarantine_dir (str): Validate the files and write bad rows here, or None to not validate.
+
+    Returns:
+        tuple: A dict of TrafficCounts per file path that could be loaded, and the TrafficCounts of
+               all of them together.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed  # Only the multi-file modes need these
+    from multiprocessing import shared_memory
+
+    n_bins = TrafficCounts(bin_seconds).n_bins
+    slot_size = n_bins * max_junctions
+    itemsize = array("L").itemsize
+    shm = shared_memory.SharedMemory(create=True, size=max(len(file_paths) * slot_size * itemsize, itemsize))
+    try:
+        shm.buf[:] = bytes(shm.size)  # Start every count at zero
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_ingest_worker, shm.name, slot, path, bin_seconds, max_junctions,
+                                       quarantine_dir): path for slot, path in enumerate(file_paths)}
+            for future in as_completed(futures):
+                try:
+                    slot, junctions = future.result()
+                except (OSError, ValueError) as error:
+                    print(f"Could not ingest {futures[future]}: {error}")  # Leave the day out, keep the others
+                    continue
+                results[slot] = junctions
+
+        # Merge the per-day matrices into TrafficCounts and multi-day totals
+        per_file = {}
+        total = TrafficCounts(bin_seconds)
+        with shm.buf.cast("L") as matrix:
+            for slot, junctions in sorted(results.items()):
+                counts = TrafficCounts(bin_seconds)
+                base = slot * slot_size
+                for j, junction in enumerate(junctions):
+                    counts.column(junction)[:] = array("L", matrix[base + j:base + slot_size:max_junctions])
+                per_file[file_paths[slot]] = counts
+                total.merge(counts)
+    finally:
+        shm.close()
+        shm.unlink()
+    return per_file, total
+
+
+def benchmark_ingestion(file_paths, bin_seconds=3600, max_workers=None):
+    """
+    Times ingest_files with 1, 2, 4, ... worker processes up to the core count.
+
+    Returns:
+        list: A dict per run with the worker count, seconds, days per second and speed-up over one worker.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    worker_counts = sorted({min(2 ** power, max_workers) for power in range(max_workers.bit_length() + 1)})
+    runs = []
+    for workers in worker_counts:
+        started = time.perf_counter()
+        ingest_files(file_paths, bin_seconds, workers)
+        elapsed = time.perf_counter() - started
+        runs.append({
+            "workers": workers,
+            "seconds": elapsed,
+            "days_per_second": len(file_paths) / elapsed,
+            "speedup": runs[0]["seconds"] / elapsed if runs else 1.0,
+        })
+    return runs
+
+
+#Batch Rendering
+def render_day(file_path, output_dir, bin_seconds=3600, junctions=(), quarantine_dir=None):
+    """
+    Loads, aggregates and renders the histogram of one survey file to an SVG image.
+    This runs in a worker process, so it only takes and returns plain values.
+
+    Args:
+        file_path (str): The path to the CSV file to be rendered.
+        output_dir (str): The directory the image is written to.
+        bin_seconds (int): The width of each histogram bin in seconds.
+        junctions (list): The entries of the junction registry giving colours and positions.
+        quarantine_dir (str): Validate the file and write bad rows here, or None to not validate.
+
+    Returns:
+        tuple: The path of the image written and the number of vehicles counted.
+    """
+    match = DATA_FILE_PATTERN.search(os.path.basename(file_path))
+    date = match.group(1) if match else survey_name(file_path)  # A file not named after its date keeps its name
+    processor = MultiCSVProcessor(streaming=True, bin_seconds=bin_seconds, quarantine_dir=quarantine_dir)
+    if not processor.stream_csv_file(file_path):
+        raise ValueError(f"Could not load {file_path}.")
+    app = HistogramApp(None, date, bin_seconds, processor.current_counts, registry=JunctionRegistry(junctions))
+    image_path = os.path.join(output_dir, f"histogram{date}.svg")
+    app.render_to_file(image_path)
+    return image_path, processor.current_counts.total()
+
+
+def render_batch(file_paths, output_dir, bin_seconds=3600, workers=None, registry=None, quarantine_dir=None):
+    """
+    Renders the histograms of many survey files in parallel without opening any window.
+
+    Args:
+        file_paths (list): The CSV files to be rendered.
+        output_dir (str): The directory the images are written to.
+        bin_seconds (int): The width of each histogram bin in seconds.
+        workers (int): The number of worker processes, or None for one per core.
+        registry (JunctionRegistry): Colours and positions of the junctions, the same in every image.
+        quarantine_dir (str): Validate the files and write bad rows here, or None to not validate.
+
+    Returns:
+        list: The paths of the images written.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    image_paths = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        junctions = registry.entries() if registry is not None else ()
+        futures = {executor.submit(render_day, path, output_dir, bin_seconds, junctions, quarantine_dir): path for path in file_paths}
+        for future in as_completed(futures):
+            try:
+                image_path, vehicles = future.result()
+            except Exception as error:  # One bad file must not stop the other days from rendering
+                print(f"Could not render {futures[future]}: {error!r}")
+                continue
+            image_paths.append(image_path)
+            print(f"Wrote {image_path} ({vehicles} vehicles)")
+    elapsed = time.perf_counter() - started
+    if image_paths:
+        print(f"Rendered {len(image_paths)} days in {elapsed:.2f}s ({len(image_paths) / elapsed:.1f} days/second)")
+    return sorted(image_paths)
+
+
+#Multi-Day Views
+def counts_by_date(per_file):
+    """
+    Keys the per-file counts returned by ingest_files by the survey date in their file names.
+    """
+    days = {}
+    for file_path, counts in per_file.items():
+        match = DATA_FILE_PATTERN.search(os.path.basename(file_path))
+        if match:
+            days[datetime.strptime(match.group(1), "%d%m%Y").date()] = counts
+    return days
+
+
+def png_bytes(width, height, rows):
+    """
+    Encodes rows of RGB bytes as a PNG image.
+    """
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    raw = b"".join(b"\x00" + row for row in rows)  # Filter type 0 before every row
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+class HeatmapView:
+    """
+    Junction x hour x day heatmap of many survey days.
+    The cells are drawn as one image with a pixel per cell, filled from the
+    count matrices and scaled up by Tk, instead of one canvas item per cell,
+    so a year of days at several junctions draws in a fraction of a second.
+    Each junction is a band of rows (one per bin), and each day a column.
+    """
+    LOW = (233, 244, 233)  # Colour of an empty cell, the canvas background
+    HIGH = (139, 0, 0)  # Colour of the busiest cell
+
+    def __init__(self, days, bin_seconds=3600, registry=None):
         """
-        Finds the maximum number of vehicles recorded in any hour across all junctions.
-        This helps in scaling the histogram bars based on the highest count.
-        
-        Returns:
-            int: The maximum number of vehicles recorded in any hour.
+        Args:
+            days (dict): TrafficCounts per survey date.
+            bin_seconds (int): The width of the bins of the counts.
+            registry (JunctionRegistry): The order of the junction bands, or None for alphabetical order.
         """
-        # Find the highest count of vehicles in any hour for any junction
-        max_vehicles = max(max(hourly_data[hour].values()) for hour in hourly_data)
-        return max_vehicles  # Return the maximum number of vehicles
+        self.days = sorted(days.items())
+        self.bin_seconds = bin_seconds
+        self.n_bins = TrafficCounts(bin_seconds).n_bins
+        junctions = {junction for _, counts in self.days for junction in counts.junctions}
+        self.junctions = (registry if registry is not None else JunctionRegistry()).order(junctions)
+        self.width, self.height = 1000, 600  # Size of the canvas
+        self.image = None  # Keeps the PhotoImage alive while it is on the canvas
 
+    def intensities(self):
+        """
+        Returns the cells as one byte (0-255, relative to the busiest cell) per pixel, row by row.
+        """
+        width = len(self.days)
+        pixels = bytearray(width * self.n_bins * len(self.junctions))
+        peak = max((counts.max() for _, counts in self.days), default=0) or 1
+        band = self.n_bins * width  # Pixels in the band of one junction
+        for j, junction in enumerate(self.junctions):
+            for d, (_, counts) in enumerate(self.days):
+                column = counts.columns.get(junction)
+                if column is not None:
+                    pixels[j * band + d:(j + 1) * band:width] = bytes(count * 255 // peak for count in column)
+        return pixels
 
-    def draw_histogram(self):
+    def rgb(self):
         """
-        Draws the histogram with axes, labels, and bars for each hour.
-        It visualizes the frequency of vehicles passing through each junction per hour.
+        Returns the cells as RGB bytes, colouring each intensity along a ramp from LOW to HIGH.
         """
-        #self.draw_axes()
-        hourly_data = self.aggregate_data()  # Get the aggregated data
-        max_vehicles = self.find_max_vehicles(hourly_data)  # Get the maximum number of vehicles
+        pixels = self.intensities()
+        ramp = [bytes(low + (high - low) * i // 255 for i in range(256)) for low, high in zip(self.LOW, self.HIGH)]
+        rgb = bytearray(len(pixels) * 3)
+        for channel in range(3):
+            rgb[channel::3] = pixels.translate(ramp[channel])  # Look every pixel up in one pass per channel
+        return rgb
 
-        bar_width = 15  # Width of each bar in the histogram
-        x_offset = 50  # Starting x position for drawing bars
-        y_offset = 550  # y position for the bottom of the bars
-        y_scale = 400 / max_vehicles if max_vehicles > 0 else 1  # Scale the bars based on the max vehicles
+    def ppm(self):
+        """
+        Returns the cells as a binary PPM image, which Tk's PhotoImage reads directly.
+        """
+        return b"P6 %d %d 255\n" % (len(self.days), self.n_bins * len(self.junctions)) + self.rgb()
 
-        # Loop through each hour and draw bars for each junction
-        for hour, counts in hourly_data.items():
-            x_base = x_offset + hour * (2 * bar_width + 10)  # x position for the bars of this hour
+    def zoom(self):
+        """
+        Returns the factors the image is scaled by to fit the plot area: a whole number
+        to enlarge it, or 1/n to shrink it when there are more cells than pixels.
+        """
+        rows = self.n_bins * len(self.junctions)
+        return self.fit(self.width - 170, len(self.days)), self.fit(self.height - 90, rows)
 
-            # Loop through each junction and draw a bar for its vehicle count
-            for i, (junction, count) in enumerate(counts.items()):
-                bar_height = count * y_scale  # Calculate the height of the bar based on the count
-                # Draw the bar for this junction
-                self.canvas.create_rectangle(
-                    x_base + i * bar_width,  # Left edge of the bar
-                    y_offset - bar_height,  # Top edge of the bar
-                    x_base + (i + 1) * bar_width,  # Right edge of the bar
-                    y_offset,  # Bottom edge of the bar
-                    fill="#b2f6a1" if i == 0 else "#e59b9d",  # Green for Elm Avenue, Red for Hanley Highway
-                    outline="black"  # Outline color for the bars
-                )
+    @staticmethod
+    def fit(available, cells):
+        """
+        Returns the scale that fits a number of cells into the available pixels.
+        """
+        cells = max(cells, 1)
+        return available // cells if cells <= available else 1 / -(-cells // available)
 
-                # Add the count value above the bar
-                self.canvas.create_text(
-                    x_base + i * bar_width + bar_width // 2,  # x position for the text
-                    y_offset - bar_height - 10,  # y position for the text
-                    text=str(count),  # Display the count value
-                    font=("Arial", 8),  # Font style for the text
-                    fill="blue" # Color for the text
-                )
+    def png(self):
+        """
+        Returns the cells as a PNG image with one pixel per cell.
+        """
+        rgb, width = self.rgb(), len(self.days) * 3
+        return png_bytes(len(self.days), self.n_bins * len(self.junctions),
+                         [rgb[start:start + width] for start in range(0, len(rgb), width)])
 
+    def draw(self, canvas):
+        """
+        Draws the heatmap image and its junction, hour and date labels on a Tkinter canvas or an SVGCanvas.
+        """
+        zoom_x, zoom_y = self.zoom()
+        left, top = 150, 50
+        if isinstance(canvas, SVGCanvas):
+            canvas.create_image(left, top, image=self.png(), anchor="nw", width=len(self.days) * zoom_x,
+                                height=self.n_bins * len(self.junctions) * zoom_y)
+        else:
+            import tkinter as tk
+            image = tk.PhotoImage(data=self.ppm(), format="PPM")
+            image = image.zoom(max(int(zoom_x), 1), max(int(zoom_y), 1))
+            if zoom_x < 1 or zoom_y < 1:
+                image = image.subsample(round(1 / min(zoom_x, 1)), round(1 / min(zoom_y, 1)))
+            self.image = image
+            canvas.create_image(left, top, image=self.image, anchor="nw")
+        band_height = self.n_bins * zoom_y
+        bins_per_hour = 3600 / self.bin_seconds  # Fractional when bins do not divide an hour
+        font_size = int(min(9, max(band_height * 0.6, 5)))  # Smaller names when there are many bands
+        label_step = max(int(-(-10 // band_height)), 1)  # Name every band, or every few when they are thin
+        for j, junction in enumerate(self.junctions):
+            y = top + j * band_height
+            if j % label_step == 0:
+                canvas.create_text(left - 30, y + band_height / 2, text=junction, anchor="e",
+                                   font=("Arial", font_size))
+            if band_height >= 48:  # Hour ticks only where there is room for them
+                for hour in range(0, 24, 6):
+                    canvas.create_text(left - 5, y + hour * bins_per_hour * zoom_y, text=str(hour).zfill(2),
+                                       anchor="ne", font=("Arial", 7))
+            canvas.create_line(left, y, left + len(self.days) * zoom_x, y, fill="white")  # Between junctions
+        step = max(len(self.days) // 8, 1)
+        for d in range(0, len(self.days), step):
+            canvas.create_text(left + d * zoom_x, top + len(self.junctions) * band_height + 12,
+                               text=self.days[d][0].strftime("%d/%m/%Y"), anchor="nw", font=("Arial", 8))
+        first, last = (self.days[0][0], self.days[-1][0]) if self.days else (None, None)
+        canvas.create_text(self.width / 2, 20, font=("Arial", 14, "bold"),
+                           text=f"Vehicles per Junction, Hour and Day ({first:%d/%m/%Y} to {last:%d/%m/%Y})"
+                           if first else "Vehicles per Junction, Hour and Day")
 
-        # Draw the hour labels at the bottom of the histogram
-        for hour in range(24):
-            x_pos = x_offset + hour * (2 * bar_width + 10) + bar_width // 2
-            self.canvas.create_text(x_pos, 560, text=str(hour).zfill(2))
+    def render_to_file(self, path):
+        """
+        Draws the heatmap and its labels onto an SVGCanvas and saves it as an image.
+        The cells are embedded as a PNG with one pixel per cell, scaled like on screen.
+        """
+        canvas = SVGCanvas(width=self.width, height=self.height, bg="#E9F4E9")
+        self.draw(canvas)
+        canvas.save(path)
 
-            
-        # Format the date as DD/MM/YYYY
-        formatted_date = f"{self.date[:2]}/{self.date[2:4]}/{self.date[4:]}"  # Format date input
 
-        # Draw the title and axis labels
-        self.canvas.create_text(
-            265, 20, text=f"Histogram of Vehicle Frequency per Hour ({formatted_date})", font=("Arial", 14, "bold")
-        )
-        self.canvas.create_text(
-            515, 592, text="Hours 00:00 to 24:00", font=("Arial", 12)
-        )
-        self.canvas.create_line(50, 550, 1000, 550, width=2)  # X-axis
-        
-        
-        
-    def add_legend(self):
-        junction_colors = {'Elm Avenue/Rabbit Road': '#b2f6a1', 'Hanley Highway/Westway': '#e59b9d'}
+class ComparisonView:
+    """
+    Hourly histograms of several survey days overlaid on one set of axes,
+    one outline per day, for one junction or all junctions together.
+    """
+    def __init__(self, days, bin_seconds=3600, junction=None):
         """
-        Adds a legend to the histogram to indicate which bar corresponds to which junction.
-        This helps users identify which color represents each junction.
+        Args:
+            days (dict): TrafficCounts per survey date.
+            bin_seconds (int): The width of the bins of the counts.
+            junction (str): The junction to compare, or None for the total of all junctions.
         """
-        y = 70
-        for junction, color in junction_colors.items():
-            self.canvas.create_rectangle(48, y,58, y+10, fill=color)
-            self.canvas.create_text(62, y+5, text=junction, anchor='w')
-            y += 20
-    def run(self):
+        self.days = sorted(days.items())
+        self.bin_seconds = bin_seconds
+        self.n_bins = TrafficCounts(bin_seconds).n_bins
+        self.junction = junction
+        self.width, self.height = 1000, 600  # Size of the canvas
+
+    def series(self, counts):
         """
-        Runs the Tkinter main loop to display the histogram.
-        This method initializes the window, draws the histogram, adds the legend, 
-        and starts the Tkinter event loop to display the GUI.
+        Returns the counts per bin of one day for the compared junction or junctions.
         """
-        self.setup_window()  # Set up the window and canvas
-        self.draw_histogram()  # Draw the histogram
-        self.add_legend()  # Add the legend to the histogram
-        self.root.mainloop()  # Start the Tkinter main loop
+        if self.junction is not None:
+            return counts.columns.get(self.junction) or array("L", bytes(self.n_bins * array("L").itemsize))
+        return [sum(column) for column in zip(*counts.columns.values())] or [0] * self.n_bins
+
+    def draw(self, canvas):
+        """
+        Draws the axes, one step outline per day and a legend of the days on a canvas.
+        """
+        series = [(day, self.series(counts)) for day, counts in self.days]
+        peak = max((max(values) for _, values in series), default=0) or 1
+        baseline, left, bin_width = self.height - 50, 50, (self.width - 170) / self.n_bins
+        y_scale = (baseline - 100) / peak
+        canvas.create_line(left, baseline, left + self.n_bins * bin_width, baseline, width=2)  # X-axis
+        hour_width = 3600 / self.bin_seconds * bin_width  # Fractional bins when bins do not divide an hour
+        for hour in range(24):
+            canvas.create_text(left + hour * hour_width + min(hour_width, bin_width) / 2, baseline + 10,
+                               text=str(hour).zfill(2))
+        for i, (day, values) in enumerate(series):
+            points = []
+            for bin_index, count in enumerate(values):
+                x, y = left + bin_index * bin_width, baseline - count * y_scale
+                points += [x, y, x + bin_width, y]  # Top edge of the bin
+            canvas.create_line(*points, width=2, fill=junction_color(i))
+            canvas.create_rectangle(self.width - 110, 70 + i * 20, self.width - 100, 80 + i * 20, fill=junction_color(i))
+            canvas.create_text(self.width - 96, 75 + i * 20, text=day.strftime("%d/%m/%Y"), anchor="w")
+        canvas.create_text(self.width / 2, 20, font=("Arial", 14, "bold"),
+                           text=f"Vehicles per Hour by Day ({self.junction or 'all junctions'})")
+        canvas.create_text(self.width / 2 + 15, self.height - 8, text="Hours 00:00 to 24:00", font=("Arial", 12))
 
+    def render_to_file(self, path):
+        """
+        Draws the comparison onto an SVGCanvas and saves it as an image.
+        """
+        canvas = SVGCanvas(width=self.width, height=self.height, bg="#E9F4E9")
+        self.draw(canvas)
+        canvas.save(path)
 
 
+def show_view(view, title):
+    """
+    Opens a window showing a multi-day view.
+    """
+    import tkinter as tk
+    root = tk.Tk()
+    root.title(title)
+    canvas = tk.Canvas(root, width=view.width, height=view.height, bg="#E9F4E9", highlightthickness=0)
+    canvas.pack()
+    view.draw(canvas)
+    root.mainloop()
 
-#Task E
-class MultiCSVProcessor:
-    def __init__(self):
+
+#HTTP Service
+class CountsServer:
+    """
+    Small asyncio HTTP server answering JSON queries for aggregated counts.
+    GET /dates lists the survey dates, and GET /counts?date=...&junction=...&bin=1h
+    returns the counts of one day per bin and junction. Aggregated days stay
+    in an in-memory LRU, and days that are not in it are parsed on a worker
+    thread, with concurrent requests for the same day sharing one load, so the
+    event loop keeps answering other requests meanwhile. Every response
+    carries an ETag derived from the survey file's modification time and size;
+    a request whose If-None-Match matches gets an empty 304 reply.
+    """
+    BIN_PATTERN = re.compile(r"(\d+)([smh]?)$")  # e.g. 1h, 15m, 900s or 900
+    UNITS = {"s": 1, "": 1, "m": 60, "h": 3600}
+    STATUS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+              422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+    def __init__(self, catalog, cache=None, quarantine_dir=None, max_days=64):
         """
-        Initializes the application for processing multiple CSV files.
-        This class handles loading multiple CSV files, processing the data, 
-        and creating the corresponding histograms for each file.
+        Args:
+            catalog (DataCatalog): The survey files to serve.
+            cache (DayCache): Binary cache of parsed days, or None to always parse the CSV.
+            quarantine_dir (str): Validate rows when parsing and write bad ones here, or None to not validate.
+            max_days (int): The number of aggregated days (per bin width) kept in memory.
         """
-        self.current_data = None  # Store the data loaded from the CSV file
+        self.catalog = catalog
+        self.cache = cache
+        self.quarantine_dir = quarantine_dir
+        self.max_days = max_days
+        self.days = OrderedDict()  # (path, bin seconds) -> (file modification time and size, TrafficCounts)
+        self.loading = {}  # (path, bin seconds) -> Future of a load in progress
 
-    def load_csv_file(self, file_path):
+    def run(self, host="127.0.0.1", port=8080):
         """
-        Loads a CSV file and processes its data.
-        This method reads the CSV file, parses it into a list of dictionaries, 
-        and stores it for further processing.
-        
-        Args:
-            file_path (str): The path to the CSV file to be loaded.
-        
-        Returns:
-            bool: True if the file is loaded successfully, False if not.
+        Serves requests until interrupted.
         """
+        import asyncio  # Imported here so that the other modes start faster
+
+        async def serve():
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"Serving {len(self.catalog)} survey days on http://{host}:{port}/ (/dates, /counts)")
+            async with server:
+                await server.serve_forever()
+
         try:
-            with open(file_path, "r") as file:
-                reader = csv.DictReader(file)  # Read the CSV file into a dictionary
-                self.current_data = [row for row in reader]  # Store the rows as a list of dictionaries
-            return True  # Return True if the file is loaded successfully
-        except FileNotFoundError:
-            print(f"File {file_path} not found.")  # Print an error message if the file is not found
-            return False  # Return False if the file is not found
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
 
-    def clear_previous_data(self):
+    async def handle(self, reader, writer):
         """
-        Clears data from the previous run to process a new dataset.
-        This ensures that the application starts fresh with each new file.
+        Answers the requests of one connection, keeping it open between requests unless asked not to.
         """
-        self.current_data = None  # Clear the previous data
+        import asyncio
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), 30)  # Close idle connections
+                except asyncio.TimeoutError:
+                    return
+                if not request_line.strip():
+                    return
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                started = time.perf_counter()
+                try:
+                    status, body, etag = await self.respond(request_line.decode("latin-1"), headers)
+                except Exception as problem:  # Answer unexpected failures too, e.g. an unreadable file
+                    status, body, etag = 500, json.dumps({"error": f"Internal error: {problem!r}"}).encode(), None
+                if INSTRUMENTATION.enabled:
+                    INSTRUMENTATION.emit({"stage": "request", "request": request_line.decode("latin-1").strip(),
+                                          "status": status, "seconds": time.perf_counter() - started})
+                keep_alive = headers.get("connection", "").lower() != "close"
+                lines = [f"HTTP/1.1 {status} {self.STATUS[status]}", "Cache-Control: no-cache",
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if etag:
+                    lines.append(f"ETag: {etag}")
+                if status != 304:
+                    lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+                writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + (body if status != 304 else b""))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # The client went away
+        finally:
+            writer.close()
 
-    def get_user_input(self):
-        def is_leap_year(year):
-            """
-            Checks if a given year is a leap year.
-            """
-            return (year % 4 == 0 and year % 100 != 0) or (year % 400 == 0)
+    async def respond(self, request_line, headers):
         """
-        Prompts the user for the date input in DDMMYYYY format and validates it.
-        This method ensures that the date is entered in the correct format before proceeding.
-        
-        Returns:
-            str: The valid date entered by the user.
+        Returns the status, JSON body and ETag answering one request.
         """
-        day, month, year = None, None, None
-        month_names = {2: "February", 4: "April", 6: "June", 9: "September", 11: "November"}
-        
-        while True:
+        def error(status, message):
+            return status, json.dumps({"error": message}).encode(), None
+
+        parts = request_line.split()
+        if len(parts) != 3:
+            return error(400, "Malformed request line.")
+        if parts[0] != "GET":
+            return error(405, "Only GET is supported.")
+        url = urllib.parse.urlsplit(parts[1])
+        query = urllib.parse.parse_qs(url.query)
+        if url.path == "/dates":
+            self.catalog = self.catalog.refreshed()  # One stat call unless files were added or removed
+            dates = [day.isoformat() for day in self.catalog.dates()]
+            etag = '"%s"' % hashlib.sha1(",".join(dates).encode()).hexdigest()[:16]
+            if headers.get("if-none-match") == etag:
+                return 304, b"", etag
+            return 200, json.dumps({"dates": dates}).encode(), etag
+        if url.path != "/counts":
+            return error(404, f"Unknown path {url.path}; use /dates or /counts.")
+
+        try:
+            day = self.parse_date(query.get("date", [""])[0])
+            bin_seconds = self.parse_bin(query.get("bin", ["1h"])[0])
+        except ValueError as problem:
+            return error(400, str(problem))
+        file_path = self.catalog.files.get(day)
+        if file_path is None:
+            self.catalog = self.catalog.refreshed()  # Lists the directory again only if a file arrived since
+            file_path = self.catalog.files.get(day)
+            if file_path is None:
+                return error(404, f"There is no survey file for {day.isoformat()}.")
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return error(404, f"There is no survey file for {day.isoformat()}.")
+        signature = (stat.st_mtime_ns, stat.st_size)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if headers.get("if-none-match") == etag:
+            return 304, b"", etag  # The client's copy is current, so nothing is loaded
+        try:
+            counts = await self.day_counts(file_path, bin_seconds, signature)
+        except ValueError as problem:
+            return error(422, f"Could not load {os.path.basename(file_path)}: {problem}")
+        junctions = query.get("junction") or counts.junctions
+        body = {
+            "date": day.isoformat(),
+            "bin_seconds": bin_seconds,
+            "junctions": {junction: list(counts.columns.get(junction, [0] * counts.n_bins)) for junction in junctions},
+        }
+        body["total"] = sum(sum(values) for values in body["junctions"].values())
+        return 200, json.dumps(body).encode(), etag
+
+    @staticmethod
+    def parse_date(text):
+        """
+        Returns the date of a query value in YYYY-MM-DD or DDMMYYYY format.
+        """
+        for format in ("%Y-%m-%d", "%d%m%Y"):
             try:
-                if day is None:
-                    day = int(input("Please enter the day of the survey in the format DD: "))
-                    if not 1 <= day <= 31:
-                        print("Out of range - values must be in the range 1 and 31.")
-                        day = None
-                        continue
+                return datetime.strptime(text, format).date()
+            except ValueError:
+                pass
+        raise ValueError("date must be given as YYYY-MM-DD or DDMMYYYY.")
 
-                if month is None:
-                    month = int(input("Please enter the month of the survey in the format MM: "))
-                    if not 1 <= month <= 12:
-                        print("Out of range - values must be in the range 1 and 12.")
-                        month = None
-                        continue
+    def parse_bin(self, text):
+        """
+        Returns the bin width in seconds of a query value such as 1h, 15m or 900s.
+        """
+        match = self.BIN_PATTERN.match(text)
+        bin_seconds = int(match.group(1)) * self.UNITS[match.group(2)] if match else 0
+        if bin_seconds <= 0 or 86400 % bin_seconds:
+            raise ValueError(f"bin {text!r} must be a width such as 1h, 15m or 900s that divides a day evenly.")
+        return bin_seconds
 
-                if year is None:
-                    year = int(input("Please enter the year of the survey in the format YYYY: "))
-                    if not 2000 <= year <= 2024:
-                        print("Out of range - values must be in the range 2000 and 2024.")
-                        year = None
-                        continue
+    async def day_counts(self, file_path, bin_seconds, signature):
+        """
+        Returns the counts of a file at a bin width, from memory or by loading it on a worker thread.
+        """
+        import asyncio
+        key = (file_path, bin_seconds)
+        entry = self.days.get(key)
+        if entry is not None and entry[0] == signature:
+            self.days.move_to_end(key)  # Most recently used
+            return entry[1]
+        future = self.loading.get(key)
+        if future is None:  # Later requests for the same day wait for this load
+            future = self.loading[key] = asyncio.get_running_loop().run_in_executor(
+                None, self.aggregate, file_path, bin_seconds)
+        try:
+            counts = await future
+        finally:
+            self.loading.pop(key, None)
+        self.days[key] = (signature, counts)
+        self.days.move_to_end(key)
+        while len(self.days) > self.max_days:
+            self.days.popitem(last=False)
+        return counts
 
-                # Additional validation for leap years and months with fewer than 31 days
-                if month == 2 and day == 29 and not is_leap_year(year):
-                    print(f"{year} is not a leap year. Please enter a valid date.")
-                    day, month, year = None, None, None
-                    continue
-                if month == 2 and day == 30:
-                    print(f"February does not have 30 days. Please enter a valid date.")
-                    day, month, year = None, None, None
-                    continue
-                if month in {2, 4, 6, 9, 11} and day == 31:
-                    print(f"{month_names[month]} does not have 31 days. Please enter a valid date.")
-                    day, month, year = None, None, None
-                    continue
+    def aggregate(self, file_path, bin_seconds):
+        """
+        Loads and aggregates one file; runs on a worker thread.
+        """
+        with INSTRUMENTATION.stage("load", file=file_path, served=True) as record:
+            table = self.cache.load(file_path) if self.cache is not None else None
+            record["cached"] = table is not None
+            if table is None:
+                validator = SurveyValidator.for_file(file_path, self.quarantine_dir) if self.quarantine_dir else None
+                table = TrafficTable.from_path(file_path, validator=validator)
+                if self.cache is not None:
+                    try:
+                        self.cache.store(file_path, table)
+                    except OSError as error:  # The counts are still served; the day is parsed again next time
+                        print(f"Could not cache {file_path}: {error}")
+            record["rows"] = len(table)
+        return TrafficCounts.from_table(table, bin_seconds)
 
-                date_str = f"{day:02d}{month:02d}{year}"
-                return date_str
 
-            except ValueError:
-                print("Integer required")
-                # Print error if invalid
+#Benchmarks
+class SyntheticDataGenerator:
+    """
+    Writes synthetic traffic_dataDDMMYYYY.csv files with the same columns and
+    value formats as the real surveys, for benchmarking at any size. Rows are
+    grouped by hour like the real files, with morning and evening peaks.
+    """
+    JUNCTIONS = {"Elm Avenue/Rabbit Road": 30, "Hanley Highway/Westway": 20}  # Junction -> speed limit
+    DIRECTIONS = ("N", "NE", "E", "SE", "S", "SW", "W", "NW")
+    WEATHER = ("Clear", "Bright", "Overcast", "Light Rain", "Heavy Rain")
+    VEHICLE_TYPES = ("Car", "Van", "Truck", "Buss", "Bicycle", "Motorcycle", "Scooter")
+    HOUR_WEIGHTS = (2, 2, 2, 2, 2, 3, 4, 6, 9, 8, 6, 5, 5, 6, 5, 5, 5, 8, 10, 7, 5, 4, 3, 2)
+    HEADER = ("JunctionName,Date,timeOfDay,travel_Direction_in,travel_Direction_out,Weather_Conditions,"
+              "JunctionSpeedLimit,VehicleSpeed,VehicleType,elctricHybrid\n")
 
-    def ask_to_continue(self):
+    def __init__(self, seed=0, junctions=None):
         """
-        Asks the user if they want to process another file or exit.
-        This allows the user to choose whether to continue or stop the program.
-        
+        Args:
+            seed (int): Seed of the random generator, so the same file is produced each time.
+            junctions (dict): Junction name -> speed limit, or None for the two surveyed junctions.
+        """
+        self.random = random.Random(seed)
+        self.junctions = junctions or self.JUNCTIONS
+
+    def write(self, file_path, rows, date_input):
+        """
+        Writes a survey file with the given number of rows.
+
+        Args:
+            file_path (str): The path of the CSV file to write.
+            rows (int): The number of vehicles in the file.
+            date_input (str): The survey date in DDMMYYYY format.
+        """
+        date_text = f"{date_input[:2]}/{date_input[2:4]}/{date_input[4:]}"
+        rng = self.random
+        junctions = list(self.junctions.items())
+        total_weight = sum(self.HOUR_WEIGHTS)
+        remaining = rows
+        with open(file_path, "w", newline="") as file:
+            file.write(self.HEADER)
+            for hour, weight in enumerate(self.HOUR_WEIGHTS):
+                hour_rows = remaining if hour == 23 else min(remaining, rows * weight // total_weight)
+                remaining -= hour_rows
+                weather = rng.choice(self.WEATHER)  # The weather changes from hour to hour
+                lines = []
+                for _ in range(hour_rows):
+                    junction, limit = rng.choice(junctions)
+                    seconds = rng.randrange(3600)
+                    lines.append(
+                        f"{junction},{date_text},{hour:02d}:{seconds // 60:02d}:{seconds % 60:02d},"
+                        f"{rng.choice(self.DIRECTIONS)},{rng.choice(self.DIRECTIONS)},{weather},{limit},"
+                        f"{max(int(rng.gauss(limit * 0.8, 8)), 1)},{rng.choice(self.VEHICLE_TYPES)},"
+                        f"{rng.random() < 0.3}\n"
+                    )
+                    if len(lines) == 10000:
+                        file.writelines(lines)
+                        lines = []
+                file.writelines(lines)
+
+
+class BenchmarkSuite:
+    """
+    Times the load, aggregate, scale and draw stages of the histogram pipeline
+    on synthetic files of several sizes, next to the row-based and csv module
+    loaders it replaced, and compares the results with a baseline saved as
+    JSON to report regressions.
+    """
+    def __init__(self, sizes=(1000, 100000), work_dir="benchmark_data", baseline_path="benchmark_baseline.json",
+                 tolerance=0.2, measure_memory=True):
+        """
+        Args:
+            sizes (tuple): The numbers of rows to benchmark.
+            work_dir (str): The directory holding the generated files, which are reused between runs.
+            baseline_path (str): The JSON file holding the baseline results.
+            tolerance (float): How much slower than the baseline a stage may be before it is a regression.
+            measure_memory (bool): Also run each stage under tracemalloc to record its peak memory.
+        """
+        self.sizes = sizes
+        self.work_dir = work_dir
+        self.baseline_path = baseline_path
+        self.tolerance = tolerance
+        self.measure_memory = measure_memory
+
+    def data_file(self, rows):
+        """
+        Returns the synthetic file with the given number of rows, generating it the first time.
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        file_path = os.path.join(self.work_dir, f"rows{rows}", "traffic_data01012024.csv")
+        if not os.path.exists(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            SyntheticDataGenerator().write(file_path, rows, "01012024")
+        return file_path
+
+    def measure(self, stage):
+        """
+        Runs a stage and returns its result, wall time in seconds and peak traced memory in bytes.
+        """
+        started = time.perf_counter()
+        result = stage()
+        elapsed = time.perf_counter() - started
+        peak = None
+        if self.measure_memory:
+            import tracemalloc
+
+            tracemalloc.start()
+            stage()  # Run again under tracemalloc, which would distort the timing
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return result, elapsed, peak
+
+    def run(self):
+        """
+        Benchmarks every size.
+
         Returns:
-            str: 'y' if the user wants to continue, 'n' if they want to exit.
+            dict: Size -> stage -> seconds, rows per second and peak bytes.
         """
-        while True:
-            continue_choice = input("Do you want to select a data file for a different date, Enter 'Y' or 'N': ").strip().lower()
-            # Check if the user input is valid
-            if continue_choice in ["y", "n"]:
-                return continue_choice  # Return the user's choice
-            else:
-                print("Invalid input. Please enter 'Y' or 'N'.")  # Print error if invalid
+        results = {}
+        time_of_day_lookup()  # Build the time parsing table once, outside the first load's timing
+        for rows in self.sizes:
+            file_path = self.data_file(rows)
+            processor = MultiCSVProcessor()
+            _, load_seconds, load_peak = self.measure(lambda: processor.load_csv_file(file_path))
+            _, rows_seconds, rows_peak = self.measure(lambda: processor.load_csv_rows(file_path))
 
-    def handle_user_interaction(self):
+            def load_csv():
+                with open_survey(file_path, "r") as file:
+                    return TrafficTable.from_csv(file)
+
+            _, csv_seconds, csv_peak = self.measure(load_csv)
+            app = HistogramApp(processor.current_data, "01012024")
+            hourly_data, aggregate_seconds, aggregate_peak = self.measure(app.aggregate_data)
+            _, scale_seconds, scale_peak = self.measure(lambda: app.find_max_vehicles(hourly_data))
+            app.counts = hourly_data  # Draw the measured counts instead of aggregating again
+
+            def draw():
+                app.canvas = SVGCanvas(width=app.width, height=app.height)
+                app.bar_items, app.hour_items, app.static_items, app.legend_items = {}, [], {}, []
+                app.draw_histogram()
+                app.add_legend()
+                return len(app.canvas.items)
+
+            items, draw_seconds, draw_peak = self.measure(draw)
+            compressed_path = file_path + ".gz"
+            if not os.path.exists(compressed_path):
+                with open(file_path, "rb") as source, gzip.open(compressed_path, "wb") as target:
+                    target.write(source.read())
+            _, gz_seconds, gz_peak = self.measure(lambda: TrafficTable.from_path(compressed_path))
+            stages = {"load": (load_seconds, load_peak), "load_gz": (gz_seconds, gz_peak),
+                      "row_loader": (rows_seconds, rows_peak), "csv_loader": (csv_seconds, csv_peak),
+                      "aggregate": (aggregate_seconds, aggregate_peak),
+                      "scale": (scale_seconds, scale_peak), "draw": (draw_seconds, draw_peak)}
+            results[str(rows)] = {
+                stage: {"seconds": seconds, "rows_per_second": rows / seconds if seconds else None,
+                        "peak_bytes": peak}
+                for stage, (seconds, peak) in stages.items()
+            }
+            results[str(rows)]["load"]["table_bytes"] = processor.current_data.nbytes()
+            results[str(rows)]["draw"]["items"] = items
+            if importlib.util.find_spec("pyarrow") is not None:
+                results[str(rows)].update(self.measure_columnar(file_path, load_seconds + aggregate_seconds))
+        return results
+
+    def measure_columnar(self, file_path, csv_seconds):
         """
-        Handles user input for processing multiple files.
-        This method interacts with the user to load CSV files, display histograms, 
-        and ask if they want to continue or exit.
+        Exports a file to each columnar format and times reading its hourly counts back,
+        next to the time and size of the CSV path.
         """
-        while True:
-            date_input = self.get_user_input()  # Get the date input from the user
-            file_path = f"traffic_data{date_input}.csv"  # Construct the file path
+        day = date(2024, 1, 1)
+        results = {}
+        for format in ColumnarStore.FORMATS:
+            store = ColumnarStore(os.path.join(os.path.dirname(file_path), format), format)
+            store.export(file_path)
+            _, seconds, peak = self.measure(lambda: store.day_counts(day))
+            results[format] = {"seconds": seconds, "csv_seconds": csv_seconds, "peak_bytes": peak,
+                               "bytes": store.nbytes(day), "csv_bytes": os.path.getsize(file_path)}
+        return results
 
-            # Try to load the CSV file and create the histogram if successful
-            if self.load_csv_file(file_path):
-                histogram_app = HistogramApp(self.current_data, date_input)
-                histogram_app.run()  # Run the histogram app to display the data
+    def run_database(self, repeats=20):
+        """
+        Bulk-loads each size into a fresh SQLite database and times the inserts and the aggregate queries.
 
-            continue_choice = self.ask_to_continue()  # Ask if the user wants to continue
-            if continue_choice == "n":
-                print("Exiting program.")  # Exit the program if the user chooses 'n'
-                break  # Break the loop to exit
-            else:
-                self.clear_previous_data()  # Clear the data if the user wants to continue
+        Returns:
+            dict: Size -> insert throughput and the median latency of each query in milliseconds.
+        """
+        results = {}
+        for rows in self.sizes:
+            file_path = self.data_file(rows)
+            db_path = os.path.join(os.path.dirname(file_path), "traffic.sqlite")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            database = SurveyDatabase(db_path)
+            started = time.perf_counter()
+            database.ingest([file_path], validate=False)
+            seconds = time.perf_counter() - started
+            day = date(2024, 1, 1)
+            queries = {"hourly_counts": lambda: database.day_counts(day),
+                       "quarter_hour_counts": lambda: database.day_counts(day, 900),
+                       "summary": database.summary, "daily_totals": database.daily_totals}
+            latencies = {}
+            for name, query in queries.items():
+                timings = []
+                for _ in range(repeats):
+                    query_started = time.perf_counter()
+                    query()
+                    timings.append(time.perf_counter() - query_started)
+                latencies[name] = sorted(timings)[len(timings) // 2] * 1000
+            results[str(rows)] = {"insert_seconds": seconds, "rows_per_second": rows / seconds,
+                                  "database_bytes": os.path.getsize(db_path), "query_ms": latencies}
+            database.close()
+        return results
 
-    def process_files(self):
+    def compare(self, results):
         """
-        Main loop for handling multiple CSV files until the user decides to quit.
-        This method continuously processes files based on user input until the user exits.
+        Compares results with the saved baseline.
+
+        Returns:
+            list: A message for every stage that got slower than the tolerance allows.
         """
-        self.handle_user_interaction()  # Start the user interaction loop
+        try:
+            with open(self.baseline_path, "r") as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            return []
+        regressions = []
+        for rows, stages in results.items():
+            for stage, measured in stages.items():
+                before = baseline.get(rows, {}).get(stage)
+                if not before:
+                    continue  # The baseline predates this stage
+                slower = measured["seconds"] - before["seconds"]
+                if slower > before["seconds"] * self.tolerance and slower > 0.001:  # Ignore sub-millisecond noise
+                    regressions.append(f"{stage} at {rows} rows: {before['seconds']:.4f}s -> {measured['seconds']:.4f}s")
+        return regressions
+
+    def save_baseline(self, results):
+        """
+        Stores results as the new baseline.
+        """
+        with open(self.baseline_path, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+def survey_date(text):
+    """
+    Checks a command-line date in DDMMYYYY format, so a mistake gets a usage message.
+    """
+    try:
+        datetime.strptime(text, "%d%m%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a valid date in DDMMYYYY format") from None
+    return text
+
+
+def bin_minutes(text):
+    """
+    Checks a command-line bin width in minutes, which must divide a day evenly.
+    """
+    try:
+        minutes = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not a whole number of minutes") from None
+    if minutes <= 0 or 1440 % minutes:
+        raise argparse.ArgumentTypeError(f"{minutes} minutes does not divide a day evenly (e.g. 15, 30, 60)")
+    return minutes
+
+
+def main(argv=None):
+    """
+    Runs the interactive program, or the batch renderer when files or a date range are given.
+    """
+    parser = argparse.ArgumentParser(description="Histograms of vehicle frequency per hour from traffic survey files.")
+    parser.add_argument("files", nargs="*", help="survey dates (DDMMYYYY), files or glob patterns to render")
+    parser.add_argument("--view", action="store_true", help="show the given dates in windows instead of rendering images")
+    parser.add_argument("--prompt", action="store_true",
+                        help="ask for dates in the terminal and open a window per date instead of one browsing window")
+    parser.add_argument("--start", type=survey_date, help="first date to render in batch mode (DDMMYYYY)")
+    parser.add_argument("--end", type=survey_date,
+                        help="last date to render in batch mode (DDMMYYYY), defaults to --start")
+    parser.add_argument("--data-dir", default=".", help="directory holding the survey files")
+    parser.add_argument("--output-dir", default="histograms", help="directory the batch images are written to")
+    parser.add_argument("--bin-minutes", type=bin_minutes, default=60, help="width of each histogram bin in minutes")
+    parser.add_argument("--workers", type=int, help="number of worker processes in batch mode")
+    parser.add_argument("--rollup", choices=TrafficDatasetIndex.BINS,
+                        help="print vehicle counts per period from the dataset index instead of rendering")
+    parser.add_argument("--junction", action="append", help="junction to include in --rollup (repeatable)")
+    parser.add_argument("--ingest", action="store_true",
+                        help="aggregate the files in parallel and print multi-day totals instead of rendering")
+    parser.add_argument("--benchmark-ingest", action="store_true",
+                        help="time parallel ingestion of the files with 1, 2, 4, ... workers")
+    parser.add_argument("--speed-report", nargs="?", const="all", choices=("all", "junction", "vehicle_type"),
+                        help="print speed and compliance statistics for the files, optionally broken down")
+    parser.add_argument("--cube", metavar="DIMENSIONS",
+                        help="print counts from the rollup cubes grouped by comma-separated dimensions, "
+                             f"from: {', '.join(RollupCube.DIMENSIONS)}")
+    parser.add_argument("--rollups", action="store_true", help="draw histograms from the rollup cubes")
+    parser.add_argument("--heatmap", action="store_true",
+                        help="draw a junction x hour x day heatmap of the given files (SVG, or a window with --view)")
+    parser.add_argument("--compare", action="store_true",
+                        help="overlay the hourly histograms of the given files (SVG, or a window with --view); "
+                             "uses the first --junction, or all junctions")
+    parser.add_argument("--validate", action="store_true",
+                        help="check every row of the given files, quarantine bad rows and print a summary per file")
+    parser.add_argument("--quarantine-dir", default="quarantine", help="directory bad rows are written to")
+    parser.add_argument("--no-validate", action="store_true", help="do not check rows when loading days to view")
+    parser.add_argument("--export", choices=tuple(ColumnarStore.FORMATS),
+                        help="convert the given files to partitioned Parquet or Arrow IPC files (needs pyarrow)")
+    parser.add_argument("--columnar", choices=tuple(ColumnarStore.FORMATS),
+                        help="draw histograms from files written by --export when they hold the date")
+    parser.add_argument("--columnar-dir", default="traffic_parquet", help="directory of the --export files")
+    parser.add_argument("--benchmark", metavar="SIZES",
+                        help="benchmark the pipeline on synthetic files with comma-separated row counts, e.g. 1000,1000000")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="baseline file for --benchmark")
+    parser.add_argument("--save-baseline", action="store_true", help="store the --benchmark results as the baseline")
+    parser.add_argument("--generate", type=int, metavar="ROWS",
+                        help="write a synthetic survey file with this many rows for --start into --data-dir")
+    parser.add_argument("--trace-stages", nargs="?", const="-", metavar="FILE",
+                        help="write per-stage timings as JSON lines to standard error or FILE")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and tracemalloc and print hotspots")
+    parser.add_argument("--db", metavar="PATH", help="SQLite database of survey rows, used to draw histograms it holds")
+    parser.add_argument("--db-ingest", action="store_true", help="bulk-load the given files into the --db database")
+    parser.add_argument("--db-summary", nargs="?", const="junction", choices=("junction", "vehicle_type"),
+                        help="print speed and compliance figures for --start/--end from the --db database")
+    parser.add_argument("--benchmark-db", metavar="SIZES",
+                        help="time SQLite bulk inserts and aggregate queries on synthetic files of these row counts")
+    parser.add_argument("--junctions", metavar="FILE",
+                        help="JSON junction registry giving names, colours and slots (default: junctions.json in --data-dir)")
+    parser.add_argument("--write-junctions", metavar="FILE",
+                        help="write a junction registry built from the survey files in --data-dir, to edit and reuse")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve /dates and /counts as JSON over HTTP on PORT")
+    parser.add_argument("--host", default="127.0.0.1", help="address --serve listens on")
+    parser.add_argument("--follow", metavar="FILE", help="show a live histogram of a survey file that is being appended to")
+    parser.add_argument("--refresh-ms", type=int, default=2000, help="how often --follow checks for new rows")
+    args = parser.parse_args(argv)
+    if args.trace_stages:
+        INSTRUMENTATION.enable(args.trace_stages)
+    if args.profile:
+        return profile_call(lambda: run_command(args))
+    return run_command(args)
+
+
+def run_command(args):
+    """
+    Runs the mode selected by the parsed command-line arguments.
+    """
+    bin_seconds = args.bin_minutes * 60
+
+    if args.generate:
+        date_input = args.start or datetime.now().strftime("%d%m%Y")
+        file_path = os.path.join(args.data_dir, f"traffic_data{date_input}.csv")
+        SyntheticDataGenerator().write(file_path, args.generate, date_input)
+        print(f"Wrote {args.generate} rows to {file_path}")
+        return 0
+
+    if args.benchmark_db:
+        suite = BenchmarkSuite(tuple(int(size) for size in args.benchmark_db.split(",")))
+        print(json.dumps(suite.run_database(), indent=2))
+        return 0
+
+    if args.benchmark:
+        suite = BenchmarkSuite(tuple(int(size) for size in args.benchmark.split(",")), baseline_path=args.baseline)
+        results = suite.run()
+        print(json.dumps(results, indent=2))
+        regressions = suite.compare(results)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if args.save_baseline:
+            suite.save_baseline(results)
+        return 1 if regressions else 0
+
+    catalog = DataCatalog(args.data_dir)  # List the data directory once at startup
+    quarantine_dir = None if args.no_validate else args.quarantine_dir
+    columnar_store = ColumnarStore(args.columnar_dir, args.columnar) if args.columnar else None
+    database = SurveyDatabase(args.db) if args.db else None
+    if args.write_junctions:
+        registry = JunctionRegistry.from_data(args.data_dir)
+        registry.save(args.write_junctions)
+        print(f"Wrote {len(registry)} junctions to {args.write_junctions}")
+        return 0
+    registry_path = args.junctions or os.path.join(args.data_dir, "junctions.json")
+    try:
+        registry = JunctionRegistry.from_file(registry_path)
+    except FileNotFoundError:
+        if args.junctions:
+            print(f"File {args.junctions} not found.")
+            return 1
+        registry = JunctionRegistry()  # Junctions get colours and slots as they appear
+    if args.db_summary:
+        if database is None:
+            print("--db-summary needs --db.")
+            return 1
+        start = datetime.strptime(args.start, "%d%m%Y").date() if args.start else None
+        end = datetime.strptime(args.end, "%d%m%Y").date() if args.end else start
+        print(json.dumps(database.summary(start, end, args.db_summary), indent=2))
+        return 0
+    if args.serve:
+        CountsServer(catalog, cache=DayCache(), quarantine_dir=quarantine_dir).run(args.host, args.serve)
+        return 0
+
+    if args.follow:
+        match = DATA_FILE_PATTERN.search(os.path.basename(args.follow))
+        if not os.path.exists(args.follow):
+            print(f"File {args.follow} not found.")
+            return 1
+        date_input = match.group(1) if match else datetime.now().strftime("%d%m%Y")
+        HistogramApp(None, date_input, bin_seconds, follow_path=args.follow, refresh_ms=args.refresh_ms,
+                     quarantine_dir=quarantine_dir, registry=registry).run()
+        return 0
+
+    if args.cube:
+        group_by = tuple(args.cube.split(","))
+        start = datetime.strptime(args.start, "%d%m%Y").date() if args.start else None
+        end = datetime.strptime(args.end, "%d%m%Y").date() if args.end else None
+        filters = {"junction": args.junction} if args.junction else {}
+        started = time.perf_counter()
+        totals = RollupStore(catalog).query(start, end, group_by, **filters)
+        for labels, count in totals.items():
+            print(" | ".join(map(str, labels)), count)
+        print(f"Answered from {len(catalog)} cubes in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return 0
+
+    if args.rollup:
+        index = TrafficDatasetIndex(args.data_dir)
+        index.refresh()
+        start = datetime.strptime(args.start, "%d%m%Y").date() if args.start else None
+        end = datetime.strptime(args.end, "%d%m%Y").date() if args.end else None
+        print(json.dumps(index.counts(args.junction, start, end, args.rollup), indent=2))
+        return 0
+
+    if args.files or args.start:
+        file_paths = []
+        for item in args.files:
+            if re.fullmatch(r"\d{8}", item):
+                try:
+                    file_path = catalog.resolve(item)
+                except ValueError:
+                    file_path = None
+                if file_path is None:
+                    print(f"There is no survey file for {item}. Survey dates available: {catalog.describe()}")
+                    return 1
+                file_paths.append(file_path)
+            else:
+                file_paths += sorted(glob.glob(item))
+        if args.start:
+            file_paths += catalog.files_in_range(args.start, args.end or args.start)
+        if not file_paths:
+            print("No survey files matched.")
+            return 1
+        if args.heatmap or args.compare:
+            days = counts_by_date(ingest_files(file_paths, bin_seconds, args.workers, quarantine_dir=quarantine_dir)[0])
+            if args.heatmap:
+                view, title, image_path = HeatmapView(days, bin_seconds, registry), "Heatmap", "heatmap.svg"
+            else:
+                junction = args.junction[0] if args.junction else None
+                view, title, image_path = ComparisonView(days, bin_seconds, junction), "Comparison", "comparison.svg"
+            if args.view:
+                show_view(view, f"{title} of {len(days)} days")
+            else:
+                os.makedirs(args.output_dir, exist_ok=True)
+                started = time.perf_counter()
+                view.render_to_file(os.path.join(args.output_dir, image_path))
+                print(f"Wrote {os.path.join(args.output_dir, image_path)} in {time.perf_counter() - started:.3f}s")
+        elif args.validate:
+            for file_path in file_paths:
+                validator = SurveyValidator.for_file(file_path, args.quarantine_dir)
+                try:
+                    counts = TrafficCounts.from_table(TrafficTable.from_path(file_path, validator=validator), bin_seconds)
+                except ValueError as error:
+                    print(f"Could not load {file_path}: {error}")
+                    continue
+                print(json.dumps({"file": file_path, "vehicles": counts.total(), **validator.summary()}))
+        elif args.db_ingest:
+            if database is None:
+                print("--db-ingest needs --db.")
+                return 1
+            started = time.perf_counter()
+            rows = database.ingest(file_paths, validate=quarantine_dir is not None, quarantine_dir=args.quarantine_dir)
+            elapsed = time.perf_counter() - started
+            print(f"Inserted {rows} rows from {len(file_paths)} files in {elapsed:.2f}s ({rows / elapsed:.0f} rows/second)")
+        elif args.export:
+            store = ColumnarStore(args.columnar_dir, args.export)
+            try:
+                for file_path in file_paths:
+                    print(f"Exported {store.export(file_path)} rows of {file_path}")
+            except ImportError:
+                print("--export needs pyarrow, which is not installed.")
+                return 1
+            print(f"{store.nbytes()} bytes in {args.columnar_dir}")
+        elif args.view:
+            processor = MultiCSVProcessor(bin_seconds=bin_seconds, cache=DayCache(), catalog=catalog,
+                                          use_rollups=args.rollups, background=True, columnar_store=columnar_store,
+                                          quarantine_dir=quarantine_dir, database=database, registry=registry)
+            for file_path in file_paths:
+                match = DATA_FILE_PATTERN.search(os.path.basename(file_path))
+                processor.show_date(match.group(1) if match else "00000000", file_path)
+                processor.clear_previous_data()
+        elif args.speed_report:
+            analytics = SpeedAnalytics.from_files(file_paths, quarantine_dir=quarantine_dir)
+            print(json.dumps(analytics.summary(None if args.speed_report == "all" else args.speed_report), indent=2))
+        elif args.benchmark_ingest:
+            print(json.dumps(benchmark_ingestion(file_paths, bin_seconds, args.workers), indent=2))
+        elif args.ingest:
+            started = time.perf_counter()
+            per_file, total = ingest_files(file_paths, bin_seconds, args.workers, quarantine_dir=quarantine_dir)
+            elapsed = time.perf_counter() - started
+            print(json.dumps({junction: list(counts) for junction, counts in total.columns.items()}))
+            print(f"Ingested {len(per_file)} days in {elapsed:.2f}s ({len(per_file) / elapsed:.1f} days/second)")
+        else:
+            render_batch(file_paths, args.output_dir, bin_seconds, args.workers, registry, quarantine_dir)
+        return 0
+
+    if not args.prompt:
+        if not catalog:
+            print("No survey files were found.")
+            return 1
+        ViewerSession(catalog, bin_seconds, cache=DayCache(), use_rollups=args.rollups,
+                      columnar_store=columnar_store, quarantine_dir=quarantine_dir, database=database,
+                      registry=registry).run()
+        return 0
+    processor = MultiCSVProcessor(bin_seconds=bin_seconds, cache=DayCache(), catalog=catalog, use_rollups=args.rollups,
+                                  background=True, columnar_store=columnar_store, quarantine_dir=quarantine_dir,
+                                  database=database, registry=registry)  # Create an instance of the processor
+    processor.process_files()  # Start processing files
+    return 0
 
 
 # Main Program
 if __name__ == "__main__":
-    processor = MultiCSVProcessor()  # Create an instance of the processor
-    processor.process_files()  # Start processing files
+    sys.exit(main())